@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+from os import path
+
+MAIN_PATH = path.join(path.dirname(path.abspath(__file__)), "..")
+sys.path.insert(0, path.join(MAIN_PATH, "src"))
+import bs4  # noqa: E402
+import config  # noqa: E402
+import core  # noqa: E402
+import tree_processing  # noqa: E402
+
+
+DATA_DIR = path.join(MAIN_PATH, "data")
+CONTEXT_LENGTH = 60
+
+
+def time_best(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def get_difference(reference, text):
+    """returns None if both texts are equal, otherwise the position of the first difference and its context"""
+    if reference == text:
+        return None
+    idx = next((i for i, (a, b) in enumerate(zip(reference, text)) if a != b), min(len(reference), len(text)))
+    start = max(0, idx - CONTEXT_LENGTH // 2)
+    return {"position": idx, "reference_length": len(reference), "length": len(text),
+            "reference_context": reference[start:idx + CONTEXT_LENGTH // 2],
+            "context": text[start:idx + CONTEXT_LENGTH // 2]}
+
+
+def compare_parsers(html_text, settings, parsers, repeat):
+    """times the parsing and the formatting of html_text with each parser, and compares their output with the one of
+    the first parser"""
+    measures = []
+    reference = None
+    for parser in parsers:
+        parser_settings = dict(settings, parser=parser)
+        parse_seconds, doc = time_best(lambda: tree_processing.parse(html_text, parser), repeat)
+        format_seconds, result = time_best(lambda: core.format_html(html_text, parser_settings), repeat)
+        outputs = {"parse": str(doc), "format_html": result.html}
+        if reference is None:
+            reference = outputs
+        measures += [{
+            "parser": parser,
+            "parse_seconds": parse_seconds,
+            "format_html_seconds": format_seconds,
+            "success": result.success,
+            "num_sequences": result.num_sequences,
+            "parse_difference": get_difference(reference["parse"], outputs["parse"]),
+            "format_html_difference": get_difference(reference["format_html"], outputs["format_html"]),
+        }]
+    return measures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description='Compare the speed and the output of the parser backends on the '
+                                                 'data examples (the output of the first parser is the reference), '
+                                                 'and output the results as JSON. Parsers that are not installed '
+                                                 'are skipped.')
+    parser.add_argument('-p', '--parsers', help='parsers to compare', type=str, nargs='+',
+                        default=tree_processing.PARSER_BACKENDS, metavar='\b')
+    parser.add_argument('-f', '--files', help='HTML files to use, all the data examples by default', type=str,
+                        nargs='+', default=[], metavar='\b')
+    parser.add_argument('-c', '--settings', help='settings JSON file, default settings are used otherwise', type=str,
+                        default="", metavar='\b')
+    parser.add_argument('-r', '--repeat', help='number of runs per measure, the best one is kept', type=int,
+                        default=5, metavar='\b')
+    parser.add_argument('-o', '--output', help='output JSON file, printed otherwise', type=str, default="",
+                        metavar='\b')
+    args = parser.parse_args()
+
+    bench_settings = config.get_default_settings()
+    if args.settings:
+        with open(args.settings, 'r') as fp:
+            bench_settings.update(json.load(fp))
+    bench_settings["save_origins_to_file"] = False
+
+    available_parsers = [p for p in args.parsers if tree_processing.is_parser_available(p)]
+    for missing_parser in sorted(set(args.parsers) - set(available_parsers)):
+        print(f"parser '{missing_parser}' is not installed, it is skipped", file=sys.stderr)
+
+    results = []
+    for file_path in args.files or sorted(glob.glob(path.join(DATA_DIR, "*.html"))):
+        with open(file_path, 'r') as f:
+            text = f.read()
+        for measure in compare_parsers(text, bench_settings, available_parsers, args.repeat):
+            measure["file"] = path.basename(file_path)
+            results += [measure]
+            print(f"{measure['file']:<36} {measure['parser']:<12} parse {measure['parse_seconds']:.6f}  "
+                  f"format_html {measure['format_html_seconds']:.6f}  "
+                  f"{'same' if measure['format_html_difference'] is None else 'different'} output",
+                  file=sys.stderr)
+
+    output = {
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "bs4": bs4.__version__,
+        "platform": platform.platform(),
+        "parsers": available_parsers,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(output, fp, indent=4)
+    else:
+        print(json.dumps(output, indent=4))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from os import path
+
+MAIN_PATH = path.join(path.dirname(path.abspath(__file__)), "..")
+sys.path.insert(0, path.join(MAIN_PATH, "src"))
+import archive  # noqa: E402
+import bs4  # noqa: E402
+import config  # noqa: E402
+import core  # noqa: E402
+
+
+PERCENTILES = [50, 90, 99]
+MAX_LISTED_CHANGES = 100
+
+
+def get_default_archives():
+    save_path = config.get_save_file_path()
+    candidates = [save_path, archive.get_archive_path(save_path, compress=True),
+                  archive.get_archive_path(save_path, archive_format="sqlite")]
+    return [p for p in candidates if path.isfile(p)]
+
+
+def load_entries(archive_paths, unique, limit):
+    """returns the (content hash, original html) of the archived runs, oldest first"""
+    entries = []
+    seen = set()
+    for archive_path in archive_paths:
+        for _, _, original_html in archive.read_entries(archive_path):
+            content_hash = archive.get_content_hash(original_html)
+            if unique and content_hash in seen:
+                continue
+            seen.add(content_hash)
+            entries += [(content_hash, original_html)]
+            if 0 < limit <= len(entries):
+                return entries
+    return entries
+
+
+def _init_worker(settings):
+    global _worker_settings
+    _worker_settings = settings
+
+
+def replay_entry(entry):
+    content_hash, original_html = entry
+    t0 = time.perf_counter()
+    result = core.format_html(original_html, _worker_settings)
+    latency = time.perf_counter() - t0
+    output_hash = hashlib.sha256(result.html.encode("utf8", "surrogatepass")).hexdigest() if result.success else ""
+    return {"content_hash": content_hash, "size": len(original_html), "seconds": latency, "success": result.success,
+            "output_hash": output_hash}
+
+
+def get_percentile(sorted_values, percentile):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, round(percentile / 100 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def compare_outputs(baseline_outputs, outputs):
+    """returns the content hashes whose result differs from the baseline, and the ones missing from the baseline"""
+    changed = []
+    new = []
+    for content_hash, output in outputs.items():
+        if content_hash not in baseline_outputs:
+            new += [content_hash]
+        elif baseline_outputs[content_hash] != output:
+            changed += [{"content_hash": content_hash, "baseline": baseline_outputs[content_hash], "current": output}]
+    return changed, new
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description='Replay the original HTML saved in the archives (text, gzip or '
+                                                 'SQLite) with the given settings in parallel, report the throughput '
+                                                 'and the latency percentiles, and compare the outputs with a '
+                                                 'baseline (the JSON output of a previous replay).')
+    parser.add_argument('-a', '--archives', help='archive files, the ones of the default save file path otherwise',
+                        type=str, nargs='+', default=[], metavar='\b')
+    parser.add_argument('-c', '--settings', help='settings JSON file, default settings are used otherwise', type=str,
+                        default="", metavar='\b')
+    parser.add_argument('-w', '--workers', help='number of worker processes (0 = number of CPU cores)', type=int,
+                        default=0, metavar='\b')
+    parser.add_argument('-b', '--baseline', help='JSON output of a previous replay to compare the outputs with',
+                        type=str, default="", metavar='\b')
+    parser.add_argument('-n', '--limit', help='maximum number of replayed runs (0 = no limit)', type=int, default=0,
+                        metavar='\b')
+    parser.add_argument('-u', '--unique', help='replay each distinct original HTML once', action='store_true')
+    parser.add_argument('-o', '--output', help='output JSON file, printed otherwise', type=str, default="",
+                        metavar='\b')
+    args = parser.parse_args()
+
+    replay_settings = config.get_default_settings()
+    if args.settings:
+        with open(args.settings, 'r') as fp:
+            replay_settings.update(json.load(fp))
+    replay_settings["save_origins_to_file"] = False
+    replay_settings["use_cache"] = False
+
+    archive_paths = args.archives or get_default_archives()
+    entries = load_entries(archive_paths, args.unique, args.limit)
+    num_workers = args.workers or os.cpu_count() or 1
+    print(f"replaying {len(entries)} runs from {', '.join(archive_paths)} with {num_workers} workers",
+          file=sys.stderr)
+
+    t_start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                                initargs=(replay_settings,)) as executor:
+        measures = list(executor.map(replay_entry, entries, chunksize=max(1, len(entries) // (num_workers * 16))))
+    wall_seconds = time.perf_counter() - t_start
+
+    latencies = sorted(m["seconds"] for m in measures)
+    total_size = sum(m["size"] for m in measures)
+    outputs = {m["content_hash"]: {"success": m["success"], "output_hash": m["output_hash"]} for m in measures}
+    summary = {
+        "runs": len(measures),
+        "distinct_inputs": len(outputs),
+        "succeeded": sum(1 for m in measures if m["success"]),
+        "wall_seconds": wall_seconds,
+        "runs_per_second": len(measures) / wall_seconds if wall_seconds else None,
+        "mb_per_second": total_size / 1e6 / wall_seconds if wall_seconds else None,
+        "latency_seconds": dict({f"p{p}": get_percentile(latencies, p) for p in PERCENTILES},
+                                max=latencies[-1] if latencies else None),
+    }
+    print(f"{summary['runs']} runs in {wall_seconds:.3f} s ({summary['runs_per_second'] or 0:.1f} runs/s, "
+          f"{summary['mb_per_second'] or 0:.2f} MB/s), latency " +
+          " ".join(f"{k} {v:.6f}" for k, v in summary["latency_seconds"].items() if v is not None), file=sys.stderr)
+
+    comparison = None
+    if args.baseline:
+        with open(args.baseline, 'r') as fp:
+            baseline = json.load(fp)
+        changed, new = compare_outputs(baseline["outputs"], outputs)
+        comparison = {"baseline": args.baseline, "num_changed": len(changed), "num_new": len(new),
+                      "changed": changed[:MAX_LISTED_CHANGES]}
+        print(f"{len(changed)} outputs changed compared to the baseline, {len(new)} inputs are not in the baseline "
+              f"(the original HTML of a changed output can be exported with: python3 src archive -s <content_hash> "
+              f"-n 1 -e <folder>)", file=sys.stderr)
+
+    output = {
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "bs4": bs4.__version__,
+        "platform": platform.platform(),
+        "archives": archive_paths,
+        "settings_hash": archive.get_settings_hash(replay_settings),
+        "workers": num_workers,
+        "summary": summary,
+        "comparison": comparison,
+        "outputs": outputs,
+    }
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(output, fp, indent=4)
+    else:
+        print(json.dumps(output, indent=4))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+import argparse
+import sys
+import time
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), "..", "src"))
+import core  # noqa: E402
+
+
+SECTION = '<h6>###start###</h6><p>first column text</p><h6>###next###</h6><p>second column text</p>' \
+          '<h6>###end###</h6><p>text between sections</p>\n'
+
+
+def build_document(num_markers):
+    return SECTION * (num_markers // 3)
+
+
+def get_replacements(html_text):
+    replacements = []
+    previous_type = core.Types.END
+    for h6_tag in core.HtmlFormatterCore._get_h6_html_data(html_text):
+        if h6_tag.type == core.Types.START:
+            new_text = core.GENERATED_HTML["start"]
+        elif h6_tag.type == core.Types.NEXT and previous_type == core.Types.START:
+            new_text = core.GENERATED_HTML["next"]
+        else:
+            new_text = core.GENERATED_HTML["end"]
+        replacements += [(h6_tag.idx_start, h6_tag.idx_end, new_text, html_text[h6_tag.idx_start:h6_tag.idx_end])]
+        previous_type = h6_tag.type
+    return replacements
+
+
+def rewrite_with_spans(html_text, replacements):
+    return core.HtmlFormatterCore._replace_spans(html_text, [r[:3] for r in replacements])
+
+
+def rewrite_with_replace(html_text, replacements):
+    # the rewriting loop used before the span based one
+    for _, _, new_text, old_text in replacements:
+        html_text = html_text.replace(old_text, new_text, 1)
+    return html_text
+
+
+def time_function(func, repeat, *args):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description='Compare the span based h6 markers rewriting with the previous '
+                                                 'str.replace loop, for an increasing number of markers.')
+    parser.add_argument('-m', '--markers', help='numbers of markers to benchmark', type=int, nargs='+',
+                        default=[10, 100, 1000, 10000, 100000], metavar='\b')
+    parser.add_argument('-r', '--repeat', help='number of runs per measure, the best one is kept', type=int,
+                        default=3, metavar='\b')
+    parser.add_argument('-l', '--legacy_max', help='maximum number of markers for the str.replace loop, which is '
+                                                   'quadratic', type=int, default=10000, metavar='\b')
+    args = parser.parse_args()
+
+    print(f"{'markers':>10} {'doc size':>12} {'spans (s)':>12} {'us/marker':>10} {'replace (s)':>12} "
+          f"{'us/marker':>10}")
+    for num_markers in args.markers:
+        doc = build_document(num_markers)
+        reps = get_replacements(doc)
+        n = max(len(reps), 1)
+        t_spans = time_function(rewrite_with_spans, args.repeat, doc, reps)
+        line = f"{len(reps):>10} {len(doc):>12} {t_spans:>12.6f} {t_spans * 1e6 / n:>10.3f}"
+        if len(reps) <= args.legacy_max:
+            if rewrite_with_spans(doc, reps) != rewrite_with_replace(doc, reps):
+                print(f"ERROR: outputs differ for {len(reps)} markers")
+                exit(1)
+            t_replace = time_function(rewrite_with_replace, args.repeat, doc, reps)
+            line += f" {t_replace:>12.6f} {t_replace * 1e6 / n:>10.3f}"
+        else:
+            line += f" {'skipped':>12} {'-':>10}"
+        print(line)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import platform
+import re
+import sys
+import time
+from datetime import datetime
+from os import path
+
+MAIN_PATH = path.join(path.dirname(path.abspath(__file__)), "..")
+sys.path.insert(0, path.join(MAIN_PATH, "src"))
+import bs4  # noqa: E402
+import config  # noqa: E402
+import core  # noqa: E402
+import tree_processing  # noqa: E402
+
+
+FIXTURE_PATH = path.join(MAIN_PATH, "data", "before_processing.html")
+SIZE_UNITS = {"k": 1000, "m": 1000 ** 2}
+
+
+def parse_size(size_str):
+    size_str = size_str.lower().rstrip("b")
+    if size_str[-1] in SIZE_UNITS:
+        return int(float(size_str[:-1]) * SIZE_UNITS[size_str[-1]])
+    return int(size_str)
+
+
+def get_app_version():
+    with open(path.join(MAIN_PATH, "src", "__main__.py"), "r") as f:
+        version = re.search(r"^__version__ = ['\"]([^'\"]*)['\"]", f.read(), re.M)
+    return version.group(1) if version else ""
+
+
+class DocumentBuilder:
+    """builds synthetic documents out of the data/before_processing.html fixture: its two sections (one START and
+    one START_INV) are repeated to get the number of markers, and the same content without markers is used as filler
+    between the sections to get the document size"""
+    def __init__(self, fixture_path=FIXTURE_PATH):
+        with open(fixture_path, "r") as f:
+            text = f.read()
+        idx_first_h6 = text.find("<h6")
+        idx_references = text.find("<h2>References</h2>")
+        idx_first_end = text.find("</h6>", text.lower().find("###end###")) + len("</h6>")
+        self.head = text[:idx_first_h6]
+        self.tail = text[idx_references:]
+        self.sections = [text[idx_first_h6:idx_first_end], text[idx_first_end:idx_references]]
+        self.filler = core.MARKERS_RE.sub("title", text[idx_first_h6:idx_references])
+
+    def build(self, size, num_markers):
+        sections = [self.sections[i % 2] for i in range(num_markers // 3)]
+        base_size = len(self.head) + len(self.tail) + sum(len(s) for s in sections)
+        num_fillers = max(0, (size - base_size) // len(self.filler))
+        parts = [self.head]
+        for i in range(max(len(sections), 1)):
+            # fillers are spread evenly between the sections
+            parts += [self.filler] * (num_fillers * (i + 1) // max(len(sections), 1) -
+                                      num_fillers * i // max(len(sections), 1))
+            if i < len(sections):
+                parts += [sections[i]]
+        parts += [self.tail]
+        return "".join(parts)
+
+
+def get_replacements(html_text):
+    replacements = []
+    previous_type = core.Types.END
+    for h6_tag in core.scan_h6_markers(html_text):
+        if h6_tag.type == core.Types.START:
+            new_text = core.GENERATED_HTML["start"]
+        elif h6_tag.type == core.Types.START_INV:
+            new_text = core.GENERATED_HTML["start_inv"]
+        elif h6_tag.type == core.Types.NEXT:
+            new_text = core.GENERATED_HTML["next" if previous_type == core.Types.START else "next_inv"]
+        else:
+            new_text = core.GENERATED_HTML["end"]
+        replacements += [(h6_tag.idx_start, h6_tag.idx_end, new_text)]
+        previous_type = h6_tag.type
+    return replacements
+
+
+def get_stages(settings):
+    """returns a list of (stage name, prepare, run): prepare(html_text) builds the arguments of run, and is not
+    included in the measured time"""
+    def parse(html_text):
+        return [bs4.BeautifulSoup(html_text, "html.parser")]
+
+    def parse_with(*extra):
+        return lambda html_text: parse(html_text) + list(extra)
+
+    def processed(html_text):
+        return core.format_html(html_text, settings).html
+
+    html_processor = core.HtmlFormatterCore()
+    return [
+        ("parse", lambda t: [t, "html.parser"], bs4.BeautifulSoup),
+        ("serialize", parse, str),
+        ("_pre_processing", lambda t: [t, settings], html_processor._pre_processing),
+        ("unwrap_shopify_useless_strong_tags", parse, tree_processing.unwrap_shopify_useless_strong_tags),
+        ("unwrap_tags_without_classes", parse_with(settings["pre_proc_unwrap_without_class_affected"]),
+         tree_processing.unwrap_tags_without_classes),
+        ("remove_none_class_attributes", parse_with(settings["pre_proc_remove_attributes_affected"]),
+         tree_processing.remove_none_class_attributes),
+        ("unwrap_tags_with_no_content", parse_with(settings["pre_proc_unwrap_no_content_affected"]),
+         tree_processing.unwrap_tags_with_no_content),
+        ("group_consecutive_tags", parse_with(settings["pre_proc_group_consecutive_affected"]),
+         tree_processing.group_consecutive_tags),
+        ("_remove_h6_elements", parse, html_processor._remove_h6_elements_tree),
+        ("_check_for_merged_h6_tags", parse, html_processor._check_for_merged_h6_tags_tree),
+        ("_check_h6_depth_correctness", parse, html_processor._check_h6_depth_correctness_tree),
+        ("_get_h6_html_data", lambda t: [t], html_processor._get_h6_html_data),
+        ("rewrite", lambda t: [t, get_replacements(t)], html_processor._replace_spans),
+        ("clear_spaces", lambda t: [processed(t)], tree_processing.clear_spaces),
+        ("prettify2", lambda t: [tree_processing.clear_spaces(processed(t))], tree_processing.prettify2),
+        ("format_html", lambda t: [t, settings], core.format_html),
+    ]
+
+
+def time_stage(prepare, run, html_text, repeat):
+    best = None
+    for _ in range(repeat):
+        args = prepare(html_text)
+        t0 = time.perf_counter()
+        run(*args)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description='Measure the time of each formatting stage on synthetic documents '
+                                                 'of increasing sizes and numbers of markers, and output the results '
+                                                 'as JSON.')
+    parser.add_argument('-s', '--sizes', help='document sizes (k and m suffixes can be used)', type=str, nargs='+',
+                        default=["10k", "100k", "1m", "10m", "50m"], metavar='\b')
+    parser.add_argument('-m', '--markers', help='numbers of h6 markers', type=int, nargs='+',
+                        default=[3, 300, 3000, 100000], metavar='\b')
+    parser.add_argument('-t', '--stages', help='only run these stages (all by default)', type=str, nargs='+',
+                        default=[], metavar='\b')
+    parser.add_argument('-r', '--repeat', help='number of runs per measure, the best one is kept', type=int,
+                        default=1, metavar='\b')
+    parser.add_argument('-x', '--max_seconds', help='a stage that takes longer than this is skipped for larger '
+                                                    'documents', type=float, default=60, metavar='\b')
+    parser.add_argument('-o', '--output', help='output JSON file, printed otherwise', type=str, default="",
+                        metavar='\b')
+    args = parser.parse_args()
+
+    bench_settings = config.get_default_settings()
+    for key in ["pre_proc_clear_shopify_tags", "pre_proc_unwrap_without_class", "pre_proc_remove_attributes",
+                "pre_proc_unwrap_no_content", "pre_proc_group_consecutive"]:
+        bench_settings[key] = True
+
+    stages = [s for s in get_stages(bench_settings) if not args.stages or s[0] in args.stages]
+    builder = DocumentBuilder()
+    cases = sorted((parse_size(size), num_markers) for size in args.sizes for num_markers in args.markers)
+    too_slow = {}
+
+    results = []
+    for size, num_markers in cases:
+        doc = builder.build(size, num_markers)
+        if len(doc) > 2 * size:
+            # the markers do not fit in a document of this size
+            continue
+        for stage_name, prepare_func, run_func in stages:
+            measure = {"size": size, "doc_size": len(doc), "markers": num_markers, "stage": stage_name,
+                       "seconds": None, "skipped": False}
+            if too_slow.get(stage_name, size) < size:
+                measure["skipped"] = True
+            else:
+                measure["seconds"] = time_stage(prepare_func, run_func, doc, args.repeat)
+                if measure["seconds"] > args.max_seconds:
+                    too_slow[stage_name] = size
+            results += [measure]
+            print(f"{size:>10} {num_markers:>7} {stage_name:<36} "
+                  f"{'skipped' if measure['skipped'] else format(measure['seconds'], '.6f')}", file=sys.stderr)
+
+    output = {
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "app_version": get_app_version(),
+        "python": platform.python_version(),
+        "bs4": bs4.__version__,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(output, fp, indent=4)
+    else:
+        print(json.dumps(output, indent=4))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from os import path
+
+MAIN_PATH = path.join(path.dirname(path.abspath(__file__)), "..")
+SRC_PATH = path.join(MAIN_PATH, "src")
+
+# modules that must not be executed before the window is shown, they are imported on first use
+HEAVY_MODULES = ["bs4", "core", "tree_processing", "formatter", "live", "batch", "streaming"]
+
+# run in a new interpreter: loads the GUI entry point as the app does, shows the main window, then prints the
+# measures as JSON on the last line of stdout
+PROBE = """
+import importlib.util, json, sys, time
+t_start = time.time()
+sys.path.insert(0, {src_path!r})
+spec = importlib.util.spec_from_file_location("app_main", {main_path!r})
+app_main = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(app_main)
+t_imported = time.time()
+app = app_main.Qw.QApplication(sys.argv)
+window = app_main.MainWindow()
+window.show()
+app.processEvents()
+t_shown = time.time()
+loaded = [m for m in {heavy_modules!r} if m in sys.modules and type(sys.modules[m]).__name__ != "_LazyModule"]
+print(json.dumps({{"t_start": t_start, "t_imported": t_imported, "t_shown": t_shown, "loaded": loaded}}))
+"""
+
+
+def parse_importtime(stderr_text):
+    """returns the (module, self microseconds, cumulative microseconds) of the modules imported by the entry point
+    (the top level lines of the python -X importtime output)"""
+    modules = []
+    for line in stderr_text.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        if name.startswith(" " * 3):
+            # nested import, already counted in the cumulative time of its parent
+            continue
+        modules += [(name.strip(), int(fields[0]), int(fields[1]))]
+    return modules
+
+
+def measure_startup(qt_platform):
+    """starts the app in a new interpreter, returns the measures in seconds, the modules imported before the window
+    was shown and the importtime output"""
+    env = dict(os.environ, QT_QPA_PLATFORM=qt_platform) if qt_platform else dict(os.environ)
+    probe = PROBE.format(src_path=SRC_PATH, main_path=path.join(SRC_PATH, "__main__.py"),
+                         heavy_modules=HEAVY_MODULES)
+    t_launch = time.time()
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], env=env, capture_output=True,
+                               text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"the app failed to start:\n{completed.stderr[-2000:]}")
+    measures = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {
+        "interpreter_seconds": measures["t_start"] - t_launch,
+        "import_seconds": measures["t_imported"] - measures["t_start"],
+        "window_seconds": measures["t_shown"] - measures["t_imported"],
+        "time_to_first_window_seconds": measures["t_shown"] - t_launch,
+        "heavy_modules_loaded": measures["loaded"],
+    }, parse_importtime(completed.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description='Start the GUI several times in a new interpreter with python -X '
+                                                 'importtime, measure the time to the first shown window, list the '
+                                                 'slowest imports, and check the median time to first window against '
+                                                 'a budget (the exit code is 1 if it is exceeded, or if a module that '
+                                                 'should be lazily imported was loaded before the window was shown).')
+    parser.add_argument('-n', '--runs', help='number of launches', type=int, default=5, metavar='\b')
+    parser.add_argument('-b', '--budget', help='maximum median time to first window in milliseconds (0 = no check)',
+                        type=float, default=1500, metavar='\b')
+    parser.add_argument('-p', '--platform', help='Qt platform plugin (QT_QPA_PLATFORM), empty to use the default one',
+                        type=str, default="offscreen", metavar='\b')
+    parser.add_argument('-t', '--top', help='number of listed imports, slowest first', type=int, default=15,
+                        metavar='\b')
+    parser.add_argument('-o', '--output', help='output JSON file, printed otherwise', type=str, default="",
+                        metavar='\b')
+    args = parser.parse_args()
+    runs = []
+    import_times = {}
+    for _ in range(args.runs):
+        run, modules = measure_startup(args.platform)
+        runs += [run]
+        for name, _, cumulative in modules:
+            import_times.setdefault(name, []).append(cumulative)
+    median_ms = {key: statistics.median(run[key] for run in runs) * 1000
+                 for key in ["interpreter_seconds", "import_seconds", "window_seconds", "time_to_first_window_seconds"]}
+    slowest_imports = sorted(((name, statistics.median(times) / 1000) for name, times in import_times.items()),
+                             key=lambda item: -item[1])[:args.top]
+    heavy_loaded = sorted({m for run in runs for m in run["heavy_modules_loaded"]})
+    within_budget = args.budget <= 0 or median_ms["time_to_first_window_seconds"] <= args.budget
+    print(f"time to first window {median_ms['time_to_first_window_seconds']:.1f} ms (median of {len(runs)} runs: "
+          f"interpreter {median_ms['interpreter_seconds']:.1f} ms, imports {median_ms['import_seconds']:.1f} ms, "
+          f"window {median_ms['window_seconds']:.1f} ms), budget {args.budget:.0f} ms", file=sys.stderr)
+    for name, ms in slowest_imports:
+        print(f"{ms:>10.1f} ms  {name}", file=sys.stderr)
+    if heavy_loaded:
+        print(f"modules loaded before the window was shown instead of on first use: {', '.join(heavy_loaded)}",
+              file=sys.stderr)
+    if not within_budget:
+        print("the time to first window exceeds the budget", file=sys.stderr)
+    output = {
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "qt_platform": args.platform,
+        "budget_ms": args.budget,
+        "median_ms": {key.replace("_seconds", ""): value for key, value in median_ms.items()},
+        "slowest_imports_ms": dict(slowest_imports),
+        "heavy_modules_loaded": heavy_loaded,
+        "within_budget": within_budget,
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(output, fp, indent=4)
+    else:
+        print(json.dumps(output, indent=4))
+    sys.exit(0 if within_budget and not heavy_loaded else 1)
@@ -51,8 +51,14 @@ if __name__ == '__main__':
 
     # ----+ freeze command -----+
     additional_param = []
+    # the icons are shipped already decoded, so that they are not decoded at each launch
+    sys.path.insert(0, path.join(main_path, 'src'))
+    import qt_icons
+    binary_icons_path = path.join(deploy_path, path.basename(qt_icons.BINARY_ICONS_PATH))
+    qt_icons.build_binary_icons(binary_icons_path)
+    additional_param += ["--add-data", f"{binary_icons_path}{os.pathsep}."]
     if sys.platform.lower() == "darwin" or sys.platform.lower() == "win32":
         app_icon = path.join(path.join(main_path, "images"), "app.ico")
         # additional_param = "-i {}".format(app_icon)
-        additional_param = ["-i", app_icon]
+        additional_param += ["-i", app_icon]
     deploy_command(deploy_path, app_path, additional_param)
@@ -3,37 +3,70 @@ __version__ = '3.2.0'
 __author__ = 'Salah Eddine Kabbour'
 __package__ = "html-auto-2columns"
 
-import tree_processing
 from ui_mainwindow import Ui_MainWindow
-from ui_settings_widget import Ui_stg_form
 import PySide6.QtGui as Qg
 import PySide6.QtCore as Qc
 import PySide6.QtWidgets as Qw
 from datetime import datetime
 import config
 import logging
-import formatter
+import cache
+import archive
 import qt_icons
 import argparse
 import sys
 import styling
 import json
+import copy
+import collections
 import os
 
+# these modules import bs4, they are only loaded when they are first used (after the window is shown)
+tree_processing = config.lazy_import("tree_processing")
+formatter = config.lazy_import("formatter")
+batch = config.lazy_import("batch")
+streaming = config.lazy_import("streaming")
+live = config.lazy_import("live")
+# the settings panel is only built when it is first shown
+ui_settings_widget = config.lazy_import("ui_settings_widget")
+
+
+# the messages are added to the logs panel at most once per interval (in milliseconds)
+LOG_FLUSH_INTERVAL = 100
+
 
 class MainWindow(Qw.QMainWindow):
+    # messages of the archive writer thread, delivered in the GUI thread
+    archive_log = Qc.Signal(str, int)
+
     def __init__(self):
         super(MainWindow, self).__init__()
 
-        self.i = qt_icons.qt_icon_from_text_image(qt_icons.APP_ICON)
+        self.i = qt_icons.get_icon("APP_ICON")
         self.setWindowIcon(self.i)
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
-        self.ui_settings = Ui_stg_form()
-        self.ui_settings.setupUi(self.ui.wid_settings)
+        self.ui_settings = None
+        self.message_dialog = None
         self.setWindowTitle(__package__)
         self.thread = None
+        self.worker = None
         self.downloader = None
+        self.live_thread = None
+        self.live_worker = None
+        self.live_pending = False
+        self.live_formatter = None
+        self.live_timer = Qc.QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.pending_logs = collections.deque()
+        self.pending_status = None
+        self.log_timer = Qc.QTimer(self)
+        self.log_timer.setSingleShot(True)
+        self.log_timer.setInterval(LOG_FLUSH_INTERVAL)
+        self.progress_bar = Qw.QProgressBar(self)
+        self.progress_bar.setMaximumWidth(250)
+        self.progress_bar.hide()
+        self.ui.statusbar.addPermanentWidget(self.progress_bar)
         self.show_logs = True
         self.show_settings = True
         self.line_wrap_mode = True
@@ -41,21 +74,122 @@ class MainWindow(Qw.QMainWindow):
         stg_file_path = config.get_config_file_path(__package__)
         if os.path.isfile(stg_file_path):
             with open(stg_file_path, 'r') as fp:
-                self.saved_settings = json.load(fp)
+                # settings added in newer versions keep their default values
+                self.saved_settings.update(json.load(fp))
                 self.log(f"Loaded Settings from file {stg_file_path}", logging.DEBUG, 5000)
-        self.restore_settings_info()
-        self.update_settings_window()
+        self.result_cache = cache.create_cache(self.saved_settings, config.get_cache_dir(__package__))
+        self.archive_writer = archive.ArchiveWriter(self.archive_log.emit)
+        self.apply_large_document_threshold()
+        self.apply_log_max_lines()
         self._style_app()
         self._connect_signals()
         self.show_hide_logs()
         self.show_hide_settings()
 
     def process_html(self):
-        html_processor = formatter.HtmlFormatter(self)
-        html_processor.log.connect(self.log)
-        html_processor.w_msg.connect(self.window_message)
-        out = html_processor.process(self.ui.plain_text_html.toPlainText(), self.saved_settings)
-        self.ui.plain_text_processed.setPlainText(out)
+        if self.worker is not None:
+            self.cancel_processing()
+            return
+
+        self.thread = Qc.QThread(self)
+        self.worker = formatter.FormatterWorker(self.ui.plain_text_html.text(),
+                                                copy.deepcopy(self.saved_settings), self.result_cache,
+                                                self.archive_writer)
+        self.worker.moveToThread(self.thread)
+        self.worker.log.connect(self.log)
+        self.worker.w_msg.connect(self.window_message)
+        self.worker.progress.connect(self.show_progress)
+        self.worker.finished.connect(self.processing_finished)
+        self.thread.started.connect(self.worker.run)
+
+        self.ui.btn_process.setText("Cancel")
+        self.ui.btn_process.setIcon(self.i_c)
+        self.progress_bar.setRange(0, len(formatter.STAGES))
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.thread.start()
+
+    def schedule_live_preview(self):
+        """restarts the live preview timer, so that the processing starts after a pause in typing"""
+        if self.saved_settings["live_preview"]:
+            self.live_timer.start(self.saved_settings["live_preview_delay"])
+
+    def start_live_preview(self):
+        if self.live_worker is not None:
+            # the text changed again, the running preview is replaced by a new one as soon as it stops
+            self.live_pending = True
+            self.live_worker.cancel()
+            return
+        if self.live_formatter is None:
+            self.live_formatter = live.IncrementalFormatter()
+        self.live_thread = Qc.QThread(self)
+        self.live_worker = formatter.LivePreviewWorker(self.live_formatter, self.ui.plain_text_html.text(),
+                                                       copy.deepcopy(self.saved_settings))
+        self.live_worker.moveToThread(self.live_thread)
+        self.live_worker.finished.connect(self.live_preview_finished)
+        self.live_thread.started.connect(self.live_worker.run)
+        self.live_thread.start()
+
+    @Qc.Slot(object)
+    def live_preview_finished(self, result):
+        regions_info = (self.live_formatter.num_formatted_regions, self.live_formatter.num_regions)
+        self.live_thread.quit()
+        self.live_thread.wait()
+        self.live_worker.deleteLater()
+        self.live_thread.deleteLater()
+        self.live_worker = None
+        self.live_thread = None
+        if self.live_pending:
+            self.live_pending = False
+            self.start_live_preview()
+        elif result.success:
+            self.ui.plain_text_processed.update_text(result.html)
+            self.log(f"Live preview: processed {regions_info[0]} of {regions_info[1]} regions", logging.DEBUG)
+        elif not result.cancelled:
+            self.ui.statusbar.showMessage(" Live preview: the HTML cannot be processed yet, press Process to see "
+                                          "the error", 5000)
+
+    def cancel_processing(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.log("Cancelling processing", logging.DEBUG, 5000)
+
+    @Qc.Slot(str, int, int)
+    def show_progress(self, stage_name, stage_idx, num_stages):
+        self.progress_bar.setRange(0, num_stages)
+        self.progress_bar.setValue(stage_idx)
+        self.progress_bar.setFormat(f"{stage_name} ({stage_idx + 1}/{num_stages})")
+
+    @Qc.Slot(object)
+    def processing_finished(self, result):
+        if not result.cancelled:
+            self.ui.plain_text_processed.set_text(result.html)
+        self._stop_processing_thread()
+        self.progress_bar.hide()
+        self.ui.btn_process.setText("Process")
+        self.ui.btn_process.setIcon(self.i_pro)
+
+    def _stop_processing_thread(self):
+        if self.thread is None:
+            return
+        self.thread.quit()
+        self.thread.wait()
+        self.worker.deleteLater()
+        self.thread.deleteLater()
+        self.worker = None
+        self.thread = None
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.cancel()
+            self._stop_processing_thread()
+        self.live_timer.stop()
+        if self.live_worker is not None:
+            self.live_worker.cancel()
+            self.live_thread.quit()
+            self.live_thread.wait()
+        self.archive_writer.close()
+        super().closeEvent(event)
 
     def clear_entries(self):
         self.log("Entries cleared")
@@ -66,11 +200,28 @@ class MainWindow(Qw.QMainWindow):
         self.log("Closing app", logging.DEBUG, 5000)
         self.close()
 
+    def apply_large_document_threshold(self):
+        """only the processed HTML pane uses the read-only large-document view, the input pane always holds the
+        full text so that it stays editable (e.g. to fix the marker an error points to)"""
+        self.ui.plain_text_processed.large_threshold = self.saved_settings["large_document_threshold"]
+
+    def apply_log_max_lines(self):
+        """the logs panel and the messages waiting to be added to it keep at most 'log_max_lines' lines (0 = no
+        limit), the oldest ones are dropped"""
+        max_lines = self.saved_settings["log_max_lines"]
+        self.ui.plain_text_logs.setMaximumBlockCount(max_lines)
+        self.pending_logs = collections.deque(self.pending_logs, maxlen=max_lines or None)
+
+    @Qc.Slot(int)
+    def large_document_loaded(self, length):
+        self.log(f"Large document ({length / 1e6:.1f} MB): only its beginning is shown, more is loaded while "
+                 f"scrolling, the full text is used for processing and copy", logging.INFO, 8000)
+
     def show_hide_logs(self):
         if self.show_logs:
             self.show_logs = False
             self.ui.plain_text_logs.hide()
-            self.ui.btn_logs.setIcon(self.i_h_logs)
+            self.ui.btn_logs.setIcon(qt_icons.get_icon("CLOSE_LOGS_ICON"))
         else:
             self.show_logs = True
             self.ui.plain_text_logs.show()
@@ -108,10 +259,16 @@ class MainWindow(Qw.QMainWindow):
         self.saved_settings["pre_proc_group_consecutive_affected"] = affected_tags[3]
 
         self.saved_settings["indent_length"] = int(self.ui_settings.sbox_indent_length.text())
+        self.saved_settings["live_preview"] = self.ui_settings.cbox_live_preview.isChecked()
+        self.saved_settings["live_preview_delay"] = self.ui_settings.sbox_live_delay.value()
 
         self.saved_settings["clear_elements"] = self.ui_settings.cbox_clear_elements.isChecked()
         self.saved_settings["save_origins_to_file"] = self.ui_settings.cbox_save_origins.isChecked()
         self.saved_settings["save_file_path"] = self.ui_settings.ledit_save_path.text()
+        self.result_cache = cache.create_cache(self.saved_settings, config.get_cache_dir(__package__))
+        # the archive writer is kept: the write options are taken from the settings of each entry
+        self.apply_large_document_threshold()
+        self.apply_log_max_lines()
         self.restore_settings_info()
         self.update_settings_window()
         self.show_hide_settings()
@@ -146,6 +303,8 @@ class MainWindow(Qw.QMainWindow):
             ", ".join(self.saved_settings["pre_proc_group_consecutive_affected"]))
 
         self.ui_settings.sbox_indent_length.setValue(self.saved_settings["indent_length"])
+        self.ui_settings.cbox_live_preview.setChecked(self.saved_settings["live_preview"])
+        self.ui_settings.sbox_live_delay.setValue(self.saved_settings["live_preview_delay"])
 
     def cancel_settings(self):
         self.restore_settings_info()
@@ -179,6 +338,11 @@ class MainWindow(Qw.QMainWindow):
         else:
             self.ui_settings.ledit_group_consecutive.setDisabled(True)
 
+        if self.ui_settings.cbox_live_preview.isChecked():
+            self.ui_settings.sbox_live_delay.setDisabled(False)
+        else:
+            self.ui_settings.sbox_live_delay.setDisabled(True)
+
     def show_hide_settings(self):
         if self.show_settings:
             self.show_settings = False
@@ -189,6 +353,8 @@ class MainWindow(Qw.QMainWindow):
             self.ui.wid_html.show()
         else:
             self.show_settings = True
+            if self.ui_settings is None:
+                self._setup_settings_panel()
             self.ui.btn_settings.setDisabled(True)
             self.ui.btn_indent.hide()
             self.ui.btn_compact.hide()
@@ -203,27 +369,30 @@ class MainWindow(Qw.QMainWindow):
 
     def copy_to_clipboard(self):
         clipboard = Qg.QClipboard()
-        processed_html = self.ui.plain_text_processed.toPlainText()
+        processed_html = self.ui.plain_text_processed.text()
         clipboard.setText(tree_processing.clear_spaces(processed_html))
         self.log("Copied processed HTML text to clipboard")
 
     def compact_html_text(self):
-        processed_html = self.ui.plain_text_processed.toPlainText()
-        self.ui.plain_text_processed.setPlainText(tree_processing.clear_spaces(processed_html))
+        processed_html = self.ui.plain_text_processed.text()
+        self.ui.plain_text_processed.set_text(tree_processing.clear_spaces(processed_html))
 
-        plain_text_html = self.ui.plain_text_html.toPlainText()
-        self.ui.plain_text_html.setPlainText(tree_processing.clear_spaces(plain_text_html))
+        plain_text_html = self.ui.plain_text_html.text()
+        self.ui.plain_text_html.set_text(tree_processing.clear_spaces(plain_text_html))
 
     def indent_html_text(self):
-        processed_html = tree_processing.clear_spaces(self.ui.plain_text_processed.toPlainText())
-        self.ui.plain_text_processed.setPlainText(tree_processing.prettify2(processed_html,
-                                                                            self.saved_settings["indent_length"]))
+        processed_html = tree_processing.clear_spaces(self.ui.plain_text_processed.text())
+        self.ui.plain_text_processed.set_text(tree_processing.prettify2(processed_html,
+                                                                            self.saved_settings["indent_length"],
+                                                                            parser=self.saved_settings["parser"]))
 
-        plain_text_html = tree_processing.clear_spaces(self.ui.plain_text_html.toPlainText())
-        self.ui.plain_text_html.setPlainText(tree_processing.prettify2(plain_text_html,
-                                                                       self.saved_settings["indent_length"]))
+        plain_text_html = tree_processing.clear_spaces(self.ui.plain_text_html.text())
+        self.ui.plain_text_html.set_text(tree_processing.prettify2(plain_text_html,
+                                                                       self.saved_settings["indent_length"],
+                                                                       parser=self.saved_settings["parser"]))
 
     def _connect_signals(self):
+        self.archive_log.connect(self.log)
         self.ui.btn_process.clicked.connect(self.process_html)
         self.ui.btn_clear.clicked.connect(self.clear_entries)
         self.ui.btn_settings.clicked.connect(self.show_hide_settings)
@@ -235,12 +404,36 @@ class MainWindow(Qw.QMainWindow):
         self.ui.btn_compact.clicked.connect(self.compact_html_text)
         self.ui.btn_indent.clicked.connect(self.indent_html_text)
         self.ui.btn_wrap.clicked.connect(self.toggle_line_wrap_mode)
+        self.ui.plain_text_html.textChanged.connect(self.schedule_live_preview)
+        self.ui.plain_text_html.large_document.connect(self.large_document_loaded)
+        self.ui.plain_text_processed.large_document.connect(self.large_document_loaded)
+        self.live_timer.timeout.connect(self.start_live_preview)
+        self.log_timer.timeout.connect(self.flush_logs)
+
+    def _setup_settings_panel(self):
+        self.ui_settings = ui_settings_widget.Ui_stg_form()
+        self.ui_settings.setupUi(self.ui.wid_settings)
+        self.restore_settings_info()
+        self.update_settings_window()
+
+        for button in [self.ui_settings.btn_change, self.ui_settings.btn_ok, self.ui_settings.btn_cancel]:
+            btn_color = button.palette().color(Qg.QPalette.Button).name()
+            button.setStyleSheet(styling.generate_button_stylesheet(btn_color))
+        line_edits = [self.ui_settings.ledit_save_path, self.ui_settings.ledit_r_class_tags,
+                      self.ui_settings.ledit_r_attributes_tags, self.ui_settings.ledit_no_content_tags,
+                      self.ui_settings.ledit_group_consecutive, ]
+        for line_edit in line_edits:
+            line_edit.setStyleSheet(styling.generate_line_edit_stylesheet(styling.COLORS["entry_bg"]))
+        self.ui_settings.btn_cancel.setIcon(self.i_c)
+        self.ui_settings.btn_ok.setIcon(qt_icons.get_icon("SAVE_ICON"))
+        self.ui_settings.btn_change.setIcon(qt_icons.get_icon("CHANGE_ICON"))
 
         self.ui_settings.cbox_save_origins.clicked.connect(self.update_settings_window)
         self.ui_settings.cbox_unwrap_no_content.clicked.connect(self.update_settings_window)
         self.ui_settings.cbox_remove_attributes.clicked.connect(self.update_settings_window)
         self.ui_settings.cbox_unwrap_without_class.clicked.connect(self.update_settings_window)
         self.ui_settings.cbox_group_consecutive.clicked.connect(self.update_settings_window)
+        self.ui_settings.cbox_live_preview.clicked.connect(self.update_settings_window)
 
         self.ui_settings.btn_ok.clicked.connect(self.save_settings)
         self.ui_settings.btn_cancel.clicked.connect(self.cancel_settings)
@@ -249,7 +442,7 @@ class MainWindow(Qw.QMainWindow):
     def toggle_line_wrap_mode(self):
         if self.line_wrap_mode:
             self.line_wrap_mode = False
-            self.ui.btn_wrap.setIcon(self.i_wn)
+            self.ui.btn_wrap.setIcon(qt_icons.get_icon("LINE_WRAP_OFF_ICON"))
             self.ui.plain_text_html.setLineWrapMode(Qw.QPlainTextEdit.LineWrapMode.NoWrap)
             self.ui.plain_text_processed.setLineWrapMode(Qw.QPlainTextEdit.LineWrapMode.NoWrap)
         else:
@@ -260,8 +453,7 @@ class MainWindow(Qw.QMainWindow):
 
     def _style_app(self):
         self.Buttons_list = [self.ui.btn_process, self.ui.btn_quit, self.ui.btn_clear, self.ui.btn_help,
-                             self.ui.btn_logs, self.ui.btn_settings, self.ui.btn_copy, self.ui_settings.btn_change,
-                             self.ui_settings.btn_ok, self.ui_settings.btn_cancel, self.ui.btn_compact,
+                             self.ui.btn_logs, self.ui.btn_settings, self.ui.btn_copy, self.ui.btn_compact,
                              self.ui.btn_indent]
         for button in self.Buttons_list:
             btn_color = button.palette().color(Qg.QPalette.Button).name()
@@ -276,65 +468,44 @@ class MainWindow(Qw.QMainWindow):
         for frame in frames:
             frame.setStyleSheet(styling.generate_frame_stylesheet(styling.COLORS["entry_bg"]))
 
-        line_edits = [self.ui_settings.ledit_save_path, self.ui_settings.ledit_r_class_tags,
-                      self.ui_settings.ledit_r_attributes_tags, self.ui_settings.ledit_no_content_tags,
-                      self.ui_settings.ledit_group_consecutive, ]
-        for line_edit in line_edits:
-            line_edit.setStyleSheet(styling.generate_line_edit_stylesheet(styling.COLORS["entry_bg"]))
-
         self.ui.frame.setStyleSheet(styling.generate_frame_stylesheet())
 
-        self.i_stg = qt_icons.qt_icon_from_text_image(qt_icons.SETTINGS_ICON)
+        self.i_stg = qt_icons.get_icon("SETTINGS_ICON")
         self.ui.btn_settings.setIcon(self.i_stg)
 
-        self.i_s_logs = qt_icons.qt_icon_from_text_image(qt_icons.SHOW_LOGS_ICON)
-        self.i_h_logs = qt_icons.qt_icon_from_text_image(qt_icons.CLOSE_LOGS_ICON)
+        self.i_s_logs = qt_icons.get_icon("SHOW_LOGS_ICON")
         self.ui.btn_logs.setIcon(self.i_s_logs)
 
-        self.i_pro = qt_icons.qt_icon_from_text_image(qt_icons.PROCESS_ICON)
+        self.i_pro = qt_icons.get_icon("PROCESS_ICON")
         self.ui.btn_process.setIcon(self.i_pro)
         #
-        self.i_q = qt_icons.qt_icon_from_text_image(qt_icons.EXIT_ICON)
+        self.i_q = qt_icons.get_icon("EXIT_ICON")
         self.ui.btn_quit.setIcon(self.i_q)
 
-        self.i_cp = qt_icons.qt_icon_from_text_image(qt_icons.COPY_ICON)
+        self.i_cp = qt_icons.get_icon("COPY_ICON")
         self.ui.btn_copy.setIcon(self.i_cp)
 
-        self.i_c = qt_icons.qt_icon_from_text_image(qt_icons.CLEAR_ICON)
+        self.i_c = qt_icons.get_icon("CLEAR_ICON")
         self.ui.btn_clear.setIcon(self.i_c)
-        self.ui_settings.btn_cancel.setIcon(self.i_c)
         #
-        self.i_h = qt_icons.qt_icon_from_text_image(qt_icons.INFO_ICON)
+        self.i_h = qt_icons.get_icon("INFO_ICON")
         self.ui.btn_help.setIcon(self.i_h)
 
-        self.i_sv = qt_icons.qt_icon_from_text_image(qt_icons.SAVE_ICON)
-        self.ui_settings.btn_ok.setIcon(self.i_sv)
-
-        self.i_ch = qt_icons.qt_icon_from_text_image(qt_icons.CHANGE_ICON)
-        self.ui_settings.btn_change.setIcon(self.i_ch)
-
-        self.i_t = qt_icons.qt_icon_from_text_image(qt_icons.TREE_ICON)
+        self.i_t = qt_icons.get_icon("TREE_ICON")
         self.ui.btn_indent.setIcon(self.i_t)
 
-        self.i_f = qt_icons.qt_icon_from_text_image(qt_icons.FLOW_ICON)
+        self.i_f = qt_icons.get_icon("FLOW_ICON")
         self.ui.btn_compact.setIcon(self.i_f)
 
-        self.i_w = qt_icons.qt_icon_from_text_image(qt_icons.LINE_WRAP_ICON)
+        self.i_w = qt_icons.get_icon("LINE_WRAP_ICON")
         self.ui.btn_wrap.setIcon(self.i_w)
 
-        self.i_wn = qt_icons.qt_icon_from_text_image(qt_icons.LINE_WRAP_OFF_ICON)
-
     def display_about_page(self):
         text = f'<div style="text-align:center"><h1>{__package__}</h1><small>v{__version__}</small></div>'
         text += config.HELP_TEXT
         self.window_message(text, "About page")
 
-    @Qc.Slot()
-    def window_message(self, msg, title="Info", minimum_width=800):
-        txt = msg.replace("<h6>", "&lt;h6&gt;")
-        txt = txt.replace("</h6>", "&lt;/h6&gt;")
-        txt = txt.replace("\n", "<br/>")
-
+    def _build_message_dialog(self):
         used_font = self.font().__copy__()
         used_size = used_font.pointSize()
         if used_size > 2:
@@ -343,10 +514,9 @@ class MainWindow(Qw.QMainWindow):
         qd = Qw.QDialog(self)
         qd.setModal(True)
         qd.setPalette(self.palette())
-        qd.setWindowTitle(title)
 
         layout = Qw.QVBoxLayout()
-        label = Qw.QLabel(txt, qd)
+        label = Qw.QLabel(qd)
         label.setTextFormat(Qc.Qt.RichText)
         label.setWordWrap(True)
         label.setPalette(self.palette())
@@ -365,9 +535,26 @@ class MainWindow(Qw.QMainWindow):
         mini_layout.addWidget(btn)
         mini_layout.addSpacerItem(h_spacer)
         layout.addLayout(mini_layout)
-        qd.setMinimumWidth(minimum_width)
 
         qd.setLayout(layout)
+        return qd, label
+
+    @Qc.Slot()
+    def window_message(self, msg, title="Info", minimum_width=800):
+        txt = msg.replace("<h6>", "&lt;h6&gt;")
+        txt = txt.replace("</h6>", "&lt;/h6&gt;")
+        txt = txt.replace("\n", "<br/>")
+
+        # the dialog is built once and reused, a message shown while the dialog is open gets a new one
+        if self.message_dialog is None:
+            self.message_dialog = self._build_message_dialog()
+        qd, label = self.message_dialog
+        if qd.isVisible():
+            qd, label = self._build_message_dialog()
+        qd.setWindowTitle(title)
+        label.setText(txt)
+        qd.setMinimumWidth(minimum_width)
+        qd.adjustSize()
         qd.show()
         qd.exec()
 
@@ -376,18 +563,31 @@ class MainWindow(Qw.QMainWindow):
         logger = logging.getLogger(__package__)
         logger.log(log_lvl, msg)
         if log_lvl == logging.INFO or log_lvl == logging.WARNING or log_lvl == logging.ERROR:
-            bar_msg = " " + msg.capitalize()
             now = datetime.now()
-            ui_log = "<span>[<span style='color: {};'>{}</span>] [{}] - {}</span>"
+            ui_log = "<p>[<span style='color: {};'>{}</span>] [{}] - {}</p>"
             keys = {logging.INFO: "INFO", logging.WARNING: "WARN", logging.ERROR: "ERROR"}
-            self.ui.plain_text_logs.appendHtml(ui_log.format(styling.LOGS_COLORS[log_lvl],
-                                                             keys[log_lvl],
-                                                             now.strftime("%H:%M:%S"),
-                                                             msg.capitalize()))
+            self.pending_logs.append(ui_log.format(styling.LOGS_COLORS[log_lvl],
+                                                   keys[log_lvl],
+                                                   now.strftime("%H:%M:%S"),
+                                                   msg.capitalize()))
+            # only the last message of an interval is shown in the status bar
+            self.pending_status = (msg, log_lvl, time)
+            if not self.log_timer.isActive():
+                self.log_timer.start()
+
+    @Qc.Slot()
+    def flush_logs(self):
+        """adds the messages logged since the last flush to the logs panel in a single append"""
+        if self.pending_logs:
+            self.ui.plain_text_logs.appendHtml("".join(self.pending_logs))
+            self.pending_logs.clear()
+        if self.pending_status is not None:
+            msg, log_lvl, time = self.pending_status
+            self.pending_status = None
             s_font = self.ui.statusbar.font()
             self.ui.statusbar.setStyleSheet(f"color: {styling.LOGS_COLORS[log_lvl]}")
             self.ui.statusbar.setFont(s_font)
-            self.ui.statusbar.showMessage(bar_msg, time)
+            self.ui.statusbar.showMessage(" " + msg.capitalize(), time)
 
 
 def boolean_string(s):
@@ -410,8 +610,116 @@ if __name__ == '__main__':
                         default=False, metavar='\b')
     parser.add_argument('-f', '--logs_file', help='Output logs to file', type=boolean_string,
                         default=False, metavar='\b')
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    batch_parser = subparsers.add_parser('batch', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                         help='format all the HTML files of a folder without starting the GUI',
+                                         description='Format all the HTML files of a folder (recursively) without '
+                                                     'starting the GUI. The files are processed in parallel and the '
+                                                     'result of each one is written to a summary JSON file.')
+    batch_parser.add_argument('-i', '--input', help='input folder', type=str, metavar='\b', required=True)
+    batch_parser.add_argument('-o', '--output', help='output folder', type=str, metavar='\b', required=True)
+    batch_parser.add_argument('-c', '--settings', help='settings JSON file (same keys as the saved app settings), '
+                                                       'default settings are used otherwise', type=str,
+                              default="", metavar='\b')
+    batch_parser.add_argument('-w', '--workers', help='number of worker processes (0 = number of CPU cores)',
+                              type=int, default=0, metavar='\b')
+    batch_parser.add_argument('-r', '--summary', help=f'summary file path, default is '
+                                                      f'{batch.SUMMARY_FILE_NAME} in the output folder', type=str,
+                              default=None, metavar='\b')
+    stream_parser = subparsers.add_parser('stream', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                          help='format a very large HTML file in streaming mode',
+                                          description='Format an HTML file by reading it by chunks and writing the '
+                                                      'output as it goes, so that the memory used does not depend on '
+                                                      'the file size. Pre-processing options are not supported.')
+    stream_parser.add_argument('-i', '--input', help='input HTML file', type=str, metavar='\b', required=True)
+    stream_parser.add_argument('-o', '--output', help='output HTML file', type=str, metavar='\b', required=True)
+    stream_parser.add_argument('-c', '--settings', help='settings JSON file (same keys as the saved app settings), '
+                                                        'default settings are used otherwise', type=str,
+                               default="", metavar='\b')
+    cache_parser = subparsers.add_parser('cache', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                         help='show or clear the results cache stored on disk',
+                                         description='Show information about the results cache stored on disk, '
+                                                     'or clear it.')
+    cache_parser.add_argument('-c', '--clear', help='remove all the cached results', type=boolean_string,
+                              default=False, metavar='\b')
+    archive_parser = subparsers.add_parser('archive', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                           help='look up or export the original HTML saved in a SQLite archive',
+                                           description='List the runs saved in a SQLite archive (setting save_format '
+                                                       '= "sqlite"), most recent first, and optionally export their '
+                                                       'original HTML. All the given filters must match.')
+    archive_parser.add_argument('-d', '--database', help='archive file', type=str, metavar='\b',
+                                default=archive.get_archive_path(config.get_save_file_path(), archive_format="sqlite"))
+    archive_parser.add_argument('-s', '--hash', help='content hash (or its beginning) of the original HTML', type=str,
+                                default="", metavar='\b')
+    archive_parser.add_argument('-g', '--settings_hash', help='settings hash (or its beginning)', type=str,
+                                default="", metavar='\b')
+    archive_parser.add_argument('-a', '--since', help='earliest time, e.g. "2020-01-02" or "2020-01-02 03:04"',
+                                type=str, default="", metavar='\b')
+    archive_parser.add_argument('-u', '--until', help='latest time (included), same format as --since', type=str,
+                                default="", metavar='\b')
+    archive_parser.add_argument('-r', '--result', help='runs to keep: all, succeeded or failed', type=str,
+                                default="all", choices=["all", "succeeded", "failed"], metavar='\b')
+    archive_parser.add_argument('-n', '--limit', help='maximum number of runs (0 = no limit)', type=int, default=20,
+                                metavar='\b')
+    archive_parser.add_argument('-e', '--export', help='folder where the original HTML of the listed runs is written',
+                                type=str, default="", metavar='\b')
+    archive_parser.add_argument('-t', '--stats', help='show the number of runs and the size of the archive',
+                                type=boolean_string, default=False, metavar='\b')
     args = parser.parse_args()
 
+    if args.command == "archive":
+        if not os.path.isfile(args.database):
+            print(f"No archive found under: {args.database}")
+            exit(1)
+        with archive.SqliteArchive(args.database) as sqlite_archive:
+            if args.stats:
+                stats = sqlite_archive.stats()
+                print(f"Archive: {stats['file_path']}\nRuns: {stats['runs']}\nDistinct original HTML: "
+                      f"{stats['bodies']}\nSize: {stats['bodies_size']} bytes ({stats['stored_size']} bytes "
+                      f"compressed)")
+                exit(0)
+            runs = sqlite_archive.find(args.hash, args.settings_hash, args.since, args.until,
+                                       {"all": None, "succeeded": True, "failed": False}[args.result], args.limit)
+            for run in runs:
+                print(f"{run['id']:>8}  {run['time']}  {'OK    ' if run['success'] else 'FAILED'}  "
+                      f"content {run['content_hash'][:16]}  settings {run['settings_hash'][:16]}  {run['size']} bytes")
+            if args.export:
+                paths = sqlite_archive.export(runs, args.export)
+                print(f"Exported {len(paths)} original HTML files to {args.export}")
+        exit(0)
+
+    if args.command == "cache":
+        result_cache = cache.ResultCache(disk_dir=config.get_cache_dir(__package__))
+        if args.clear:
+            print(f"Removed {result_cache.clear()} cached results from {result_cache.disk_dir}")
+        else:
+            stats = result_cache.stats()
+            print(f"Cache folder: {stats['disk_dir']}\nCached results: {stats['disk_entries']}\n"
+                  f"Size: {stats['disk_size']} bytes")
+        exit(0)
+
+    if args.command == "batch":
+        config.setup_logging(__package__, args.log_level, args.logs_file)
+        logger = logging.getLogger(__package__)
+        if not os.path.isdir(args.input):
+            logger.error(f"No folder found under: {args.input}")
+            exit(1)
+        summary = batch.run_batch(args.input, args.output, batch.get_batch_settings(args.settings), args.workers,
+                                  args.summary, config.get_cache_dir(__package__))
+        logger.info(f"Processed {summary['num_files']} files: {summary['num_success']} succeeded, "
+                    f"{summary['num_failed']} failed")
+        exit(0 if summary['num_failed'] == 0 else 2)
+
+    if args.command == "stream":
+        config.setup_logging(__package__, args.log_level, args.logs_file)
+        logger = logging.getLogger(__package__)
+        if not os.path.isfile(args.input):
+            logger.error(f"No file found under: {args.input}")
+            exit(1)
+        stream_result = streaming.format_file(args.input, args.output, batch.get_batch_settings(args.settings),
+                                              lambda msg, log_lvl: logger.log(log_lvl, msg), logger.debug)
+        exit(0 if stream_result.success else 2)
+
     if args.style_keys:
         print(Qw.QStyleFactory.keys())
         exit(0)
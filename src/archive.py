@@ -0,0 +1,328 @@
+import gzip
+import hashlib
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+import config
+
+
+LINE_LENGTH = 120
+
+ARCHIVE_FORMATS = ["text", "sqlite"]
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# errors that can be raised when writing to the archive
+WRITE_ERRORS = (IOError, OSError, sqlite3.Error)
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bodies (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    time TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    settings_hash TEXT NOT NULL,
+    content_hash TEXT NOT NULL REFERENCES bodies(hash)
+);
+CREATE INDEX IF NOT EXISTS runs_time ON runs(time);
+CREATE INDEX IF NOT EXISTS runs_content_hash ON runs(content_hash);
+CREATE INDEX IF NOT EXISTS runs_settings_hash ON runs(settings_hash);
+"""
+
+
+def wrap_lines(original_html, line_length=LINE_LENGTH):
+    """splits original_html in lines of at least line_length characters that end with a '>' (the last one can be
+    shorter), looking for each line end with str.find instead of copying the text one character at a time"""
+    lines = []
+    pos = 0
+    while True:
+        idx_end = original_html.find(">", pos + max(line_length, 1) - 1)
+        if idx_end == -1:
+            break
+        lines += [original_html[pos:idx_end + 1]]
+        pos = idx_end + 1
+    if original_html[pos:] != ">":
+        lines += [original_html[pos:]]
+    return lines
+
+
+def format_entry(original_html, is_ok, now=None, line_length=LINE_LENGTH):
+    """returns the text of an archive entry, as written in the 'save file'"""
+    now = datetime.now() if now is None else now
+    parts = [("=" * (line_length + 20) + "\n") * 3,
+             f'\nTime: {now.strftime(TIME_FORMAT)}\n',
+             'HTML Formatting succeeded\n' if is_ok else 'HTML Formatting FAILED!\n',
+             "\n\nOriginal html=\n"]
+    parts += [line + "\n" for line in wrap_lines(original_html, line_length)]
+    parts += ["\n\n\n\n\n\n"]
+    return "".join(parts)
+
+
+def unwrap_lines(wrapped_html, line_length=LINE_LENGTH):
+    """inverse of wrap_lines: returns the original HTML from the text written by format_entry (its lines joined with
+    a line break after each one). The line breaks added by wrap_lines are the ones that follow the first '>' found
+    line_length - 1 characters after the beginning of each line, the other ones are part of the original HTML."""
+    parts = []
+    pos = 0
+    while pos < len(wrapped_html):
+        idx_end = wrapped_html.find(">", pos + max(line_length, 1) - 1)
+        if idx_end == -1:
+            parts += [wrapped_html[pos:-1]]
+            break
+        parts += [wrapped_html[pos:idx_end + 1]]
+        pos = idx_end + 2
+    return "".join(parts)
+
+
+def parse_entries(text, line_length=LINE_LENGTH):
+    """yields the entries of a text archive as (time, is_ok, original_html) tuples, time is a datetime"""
+    banner = ("=" * (line_length + 20) + "\n") * 3
+    for entry in text.split(banner)[1:]:
+        header, _, wrapped_html = entry.partition("\n\nOriginal html=\n")
+        time_line, _, result_line = header.strip("\n").partition("\n")
+        now = datetime.strptime(time_line[len("Time: "):], TIME_FORMAT)
+        yield now, result_line.startswith("HTML Formatting succeeded"), unwrap_lines(wrapped_html[:-6], line_length)
+
+
+def is_sqlite_file(file_path):
+    with open(file_path, 'rb') as f:
+        return f.read(16) == b"SQLite format 3\x00"
+
+
+def read_entries(file_path):
+    """yields the entries of an archive file (text, gzip compressed text or SQLite) as (time, is_ok, original_html)
+    tuples, oldest first"""
+    if is_sqlite_file(file_path):
+        with SqliteArchive(file_path) as sqlite_archive:
+            yield from sqlite_archive.iter_entries()
+        return
+    open_func = gzip.open if file_path.endswith(".gz") else open
+    with open_func(file_path, 'rt', encoding='utf8') as f:
+        text = f.read()
+    yield from parse_entries(text)
+
+
+def get_archive_path(file_path, compress=False, archive_format="text"):
+    if archive_format == "sqlite":
+        return os.path.splitext(file_path)[0] + ".sqlite"
+    if compress and not file_path.endswith(".gz"):
+        return file_path + ".gz"
+    return file_path
+
+
+def rotate(file_path, max_bytes, backup_count):
+    """renames file_path to file_path.1 (file_path.1 to file_path.2, ...) if it is larger than max_bytes, at most
+    backup_count old files are kept (the file is removed if backup_count is 0)"""
+    if max_bytes <= 0 or not os.path.isfile(file_path) or os.path.getsize(file_path) < max_bytes:
+        return
+    for i in range(backup_count - 1, 0, -1):
+        if os.path.isfile(f"{file_path}.{i}"):
+            os.replace(f"{file_path}.{i}", f"{file_path}.{i + 1}")
+    if backup_count > 0:
+        os.replace(file_path, f"{file_path}.1")
+    else:
+        os.remove(file_path)
+
+
+def append_entry(file_path, entry, compress=False, max_bytes=0, backup_count=3):
+    """appends the entry text to the archive file, compressed entries are appended as new gzip members (the file can
+    be read with gzip.open). Returns the path of the written file."""
+    file_path = get_archive_path(file_path, compress)
+    rotate(file_path, max_bytes, backup_count)
+    if compress:
+        with gzip.open(file_path, 'at', encoding='utf8') as f:
+            f.write(entry)
+    else:
+        with open(file_path, 'a') as f:
+            f.write(entry)
+    return file_path
+
+
+def get_content_hash(original_html):
+    return hashlib.sha256(original_html.encode("utf8", "surrogatepass")).hexdigest()
+
+
+def get_settings_hash(settings):
+    return hashlib.sha256(config.get_settings_key(settings).encode("utf8")).hexdigest()
+
+
+class SqliteArchive:
+    """Archive stored in a SQLite database: each run (time, success, settings hash and content hash) is a row of the
+    indexed 'runs' table, and each distinct original HTML is stored once, compressed with zlib, in the 'bodies' table.
+    A SqliteArchive must be used in the thread that created it."""
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.connection = sqlite3.connect(file_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SQLITE_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, original_html, is_ok, settings_hash="", now=None):
+        """archives a run, the original HTML is only stored if it is not already in the archive. Returns the run id"""
+        now = datetime.now() if now is None else now
+        data = original_html.encode("utf8", "surrogatepass")
+        content_hash = hashlib.sha256(data).hexdigest()
+        with self.connection:
+            if self.connection.execute("SELECT 1 FROM bodies WHERE hash = ?", (content_hash,)).fetchone() is None:
+                self.connection.execute("INSERT INTO bodies (hash, size, data) VALUES (?, ?, ?)",
+                                        (content_hash, len(data), zlib.compress(data)))
+            cursor = self.connection.execute(
+                "INSERT INTO runs (time, success, settings_hash, content_hash) VALUES (?, ?, ?, ?)",
+                (now.strftime(TIME_FORMAT), int(is_ok), settings_hash, content_hash))
+        return cursor.lastrowid
+
+    def find(self, content_hash="", settings_hash="", since="", until="", success=None, limit=100):
+        """returns the runs matching all the given filters, most recent first, as dicts with the keys: id, time,
+        success, settings_hash, content_hash and size. The hashes can be prefixes, since and until are times
+        (or the beginning of a time, like "2020-01-02") as written in the archive. limit=0 returns all the runs."""
+        conditions = []
+        params = []
+        for column, prefix in [("runs.content_hash", content_hash), ("runs.settings_hash", settings_hash)]:
+            if prefix:
+                # range instead of LIKE, so that the index is used ('g' follows all the hexadecimal digits)
+                conditions += [f"{column} >= ? AND {column} < ?"]
+                params += [prefix.lower(), prefix.lower() + "g"]
+        if since:
+            conditions += ["runs.time >= ?"]
+            params += [since]
+        if until:
+            # until is inclusive, also for a time beginning
+            conditions += ["runs.time < ?"]
+            params += [until + "~"]
+        if success is not None:
+            conditions += ["runs.success = ?"]
+            params += [int(success)]
+        query = "SELECT runs.id, runs.time, runs.success, runs.settings_hash, runs.content_hash, bodies.size " \
+                "FROM runs JOIN bodies ON bodies.hash = runs.content_hash"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY runs.time DESC, runs.id DESC"
+        if limit > 0:
+            query += " LIMIT ?"
+            params += [limit]
+        runs = [dict(row) for row in self.connection.execute(query, params)]
+        for run in runs:
+            run["success"] = bool(run["success"])
+        return runs
+
+    def get_body(self, content_hash):
+        """returns the original HTML with the given content hash, or None if it is not in the archive"""
+        row = self.connection.execute("SELECT data FROM bodies WHERE hash = ?", (content_hash,)).fetchone()
+        if row is None:
+            return None
+        return zlib.decompress(row["data"]).decode("utf8", "surrogatepass")
+
+    def iter_entries(self):
+        """yields all the runs as (time, is_ok, original_html) tuples, oldest first"""
+        query = "SELECT runs.time, runs.success, bodies.data FROM runs JOIN bodies ON bodies.hash = runs.content_hash " \
+                "ORDER BY runs.time, runs.id"
+        for row in self.connection.execute(query):
+            yield (datetime.strptime(row["time"], TIME_FORMAT), bool(row["success"]),
+                   zlib.decompress(row["data"]).decode("utf8", "surrogatepass"))
+
+    def export(self, runs, out_dir):
+        """writes the original HTML of each run to out_dir (named after the run time and id), each body is read
+        once even if several runs share it. Returns the written paths."""
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+        bodies = {}
+        for run in runs:
+            if run["content_hash"] not in bodies:
+                bodies[run["content_hash"]] = self.get_body(run["content_hash"])
+            file_name = f"{run['time'].replace(' ', '_').replace(':', '-')}_{run['id']}.html"
+            with open(os.path.join(out_dir, file_name), 'w', encoding='utf8') as f:
+                f.write(bodies[run["content_hash"]])
+            paths += [os.path.join(out_dir, file_name)]
+        return paths
+
+    def stats(self):
+        num_runs = self.connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        num_bodies, size, stored_size = self.connection.execute(
+            "SELECT COUNT(*), TOTAL(size), TOTAL(LENGTH(data)) FROM bodies").fetchone()
+        return {"file_path": self.file_path, "runs": num_runs, "bodies": num_bodies, "bodies_size": int(size),
+                "stored_size": int(stored_size)}
+
+
+def save_original(file_path, original_html, is_ok, now=None, compress=False, max_bytes=0, backup_count=3,
+                  archive_format="text", settings_hash=""):
+    """writes a run to the archive in the given format, the other arguments are the ones of get_write_options.
+    Returns the path of the written file."""
+    if archive_format == "sqlite":
+        file_path = get_archive_path(file_path, archive_format=archive_format)
+        with SqliteArchive(file_path) as sqlite_archive:
+            sqlite_archive.add(original_html, is_ok, settings_hash, now)
+        return file_path
+    return append_entry(file_path, format_entry(original_html, is_ok, now), compress, max_bytes, backup_count)
+
+
+def get_write_options(settings):
+    return {"compress": settings["save_compress"], "max_bytes": settings["save_max_bytes"],
+            "backup_count": settings["save_backup_count"], "archive_format": settings["save_format"],
+            "settings_hash": get_settings_hash(settings) if settings["save_format"] == "sqlite" else ""}
+
+
+class ArchiveWriter:
+    """Writes the archive entries in a background thread, so that saving the original HTML does not delay the
+    formatting result. log_callback(msg, log_lvl) is called from the writer thread after each write."""
+    def __init__(self, log_callback=None):
+        self.log_callback = log_callback
+        self.entries = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def write(self, file_path, original_html, is_ok, settings):
+        """queues an entry, the time of the entry is the time of this call"""
+        if file_path == "":
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="archive-writer", daemon=True)
+                self.thread.start()
+        self.entries.put((file_path, original_html, is_ok, datetime.now(), get_write_options(settings)))
+
+    def flush(self):
+        """waits until all the queued entries are written"""
+        self.entries.join()
+
+    def close(self):
+        with self.lock:
+            if self.thread is None:
+                return
+            self.entries.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def _log(self, msg, log_lvl):
+        if self.log_callback is not None:
+            self.log_callback(msg, log_lvl)
+
+    def _run(self):
+        while True:
+            item = self.entries.get()
+            try:
+                if item is None:
+                    return
+                file_path, original_html, is_ok, now, options = item
+                try:
+                    save_original(file_path, original_html, is_ok, now, **options)
+                    self._log("Successfully written original HTML to 'save file'", logging.INFO)
+                except WRITE_ERRORS:
+                    self._log(f"WARNING: Could not write to file {file_path}.", logging.WARNING)
+            finally:
+                self.entries.task_done()
@@ -0,0 +1,96 @@
+import concurrent.futures
+import logging
+import json
+import os
+import config
+import cache
+
+core = config.lazy_import("core")
+
+
+HTML_EXTENSIONS = (".html", ".htm")
+SUMMARY_FILE_NAME = "batch_summary.json"
+
+_worker_settings = None
+_worker_cache = None
+
+
+def get_batch_settings(settings_path=None):
+    settings = config.get_default_settings()
+    if settings_path:
+        with open(settings_path, 'r') as fp:
+            settings.update(json.load(fp))
+    # concurrent workers appending to the same file would mix their entries
+    settings["save_origins_to_file"] = False
+    return settings
+
+
+def list_html_files(input_dir):
+    files = []
+    for root, _, names in os.walk(input_dir):
+        for name in names:
+            if name.lower().endswith(HTML_EXTENSIONS):
+                files += [os.path.relpath(os.path.join(root, name), input_dir)]
+    return sorted(files)
+
+
+def _init_worker(settings, cache_dir):
+    global _worker_settings, _worker_cache
+    _worker_settings = settings
+    _worker_cache = cache.create_cache(settings, cache_dir)
+
+
+def process_file(in_path, out_path, settings=None, result_cache=None):
+    """formats one file, the result is written to out_path only if the formatting succeeded"""
+    if settings is None:
+        settings = _worker_settings
+        result_cache = _worker_cache
+    result = {"file": in_path, "success": False, "messages": [], "window_message": ""}
+    try:
+        with open(in_path, 'r', encoding='utf8') as f:
+            html_text = f.read()
+        formatted = core.format_html(html_text, settings, cache=result_cache)
+        result["messages"] = [{"level": logging.getLevelName(m.level), "message": m.text}
+                              for m in formatted.messages if m.level >= logging.INFO]
+        result["window_message"] = formatted.window_message
+        if formatted.success:
+            os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+            with open(out_path, 'w', encoding='utf8') as f:
+                f.write(formatted.html)
+            result["success"] = True
+    except (IOError, UnicodeDecodeError) as e:
+        result["messages"] += [{"level": "ERROR", "message": f"ERROR: could not process file: {e}"}]
+    return result
+
+
+def _process_job(job):
+    return process_file(*job)
+
+
+def run_batch(input_dir, output_dir, settings, num_workers=None, summary_path=None, cache_dir=None):
+    """formats all the HTML files of input_dir into output_dir (keeping the same relative paths) using a pool of
+    num_workers processes, and writes the result of each file to a JSON summary file. Returns the summary.
+    cache_dir is the results cache folder used when both 'use_cache' and 'cache_on_disk' settings are enabled."""
+    files = list_html_files(input_dir)
+    jobs = [(os.path.join(input_dir, f), os.path.join(output_dir, f)) for f in files]
+    num_workers = num_workers or os.cpu_count() or 1
+    chunk_size = max(1, len(jobs) // (num_workers * 4))
+
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                                initargs=(settings, cache_dir)) as executor:
+        for result in executor.map(_process_job, jobs, chunksize=chunk_size):
+            result["file"] = os.path.relpath(result["file"], input_dir)
+            results += [result]
+
+    num_success = sum(1 for r in results if r["success"])
+    summary = {"input_dir": os.path.abspath(input_dir), "output_dir": os.path.abspath(output_dir),
+               "num_files": len(results), "num_success": num_success, "num_failed": len(results) - num_success,
+               "files": results}
+
+    if summary_path is None:
+        summary_path = os.path.join(output_dir, SUMMARY_FILE_NAME)
+    os.makedirs(os.path.dirname(os.path.abspath(summary_path)), exist_ok=True)
+    with open(summary_path, 'w', encoding='utf8') as fp:
+        json.dump(summary, fp, indent=4)
+    return summary
@@ -0,0 +1,139 @@
+import collections
+import hashlib
+import json
+import os
+import config
+
+core = config.lazy_import("core")
+tree_processing = config.lazy_import("tree_processing")
+
+
+# to be increased each time the output of the formatter changes for the same input and settings
+CACHE_VERSION = 4
+
+
+def get_cache_key(html_text, settings):
+    # the key holds the parser that is actually used, which is not the requested one if its package is missing
+    settings = dict(settings, parser=tree_processing.get_usable_parser(settings["parser"]))
+    h = hashlib.sha256()
+    h.update(f"v{CACHE_VERSION}\n{config.get_settings_key(settings)}\n".encode("utf8"))
+    h.update(html_text.encode("utf8", "surrogatepass"))
+    return h.hexdigest()
+
+
+def create_cache(settings, disk_dir):
+    """returns the ResultCache described by the settings, or None if the cache is disabled"""
+    if not settings["use_cache"]:
+        return None
+    return ResultCache(settings["cache_max_entries"], disk_dir if settings["cache_on_disk"] else None)
+
+
+def result_to_dict(result):
+    return {
+        "html": result.html,
+        "success": result.success,
+        "messages": [[m.text, m.level] for m in result.messages],
+        "window_message": result.window_message,
+        "num_sequences": result.num_sequences,
+        "num_cleared_h6": result.num_cleared_h6,
+        "num_cleared_previous_html_elements": result.num_cleared_previous_html_elements,
+        "num_line_breaks": result.num_line_breaks,
+        "pre_processing_hits": result.pre_processing_hits,
+        "depth_offenders": result.depth_offenders,
+    }
+
+
+def result_from_dict(data):
+    result = core.FormatResult()
+    for key, value in data.items():
+        setattr(result, key, value)
+    result.messages = [core.Message(text, level) for text, level in data["messages"]]
+    return result
+
+
+class ResultCache:
+    """Cache of formatting results keyed on the hash of the input HTML and the settings. Results are kept in a
+    memory LRU of max_entries, and also written as JSON files in disk_dir when it is given."""
+    def __init__(self, max_entries=64, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(html_text, settings):
+        return get_cache_key(html_text, settings)
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        if self.disk_dir is not None:
+            try:
+                with open(self._get_file_path(key), 'r', encoding='utf8') as fp:
+                    result = result_from_dict(json.load(fp))
+                self._put_in_memory(key, result)
+                self.disk_hits += 1
+                return result
+            except (IOError, ValueError, KeyError):
+                pass
+        self.misses += 1
+        return None
+
+    def put(self, key, result):
+        self._put_in_memory(key, result)
+        if self.disk_dir is None:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            file_path = self._get_file_path(key)
+            # written under a temporary name first, as other processes can read the same folder
+            tmp_path = f"{file_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf8') as fp:
+                json.dump(result_to_dict(result), fp)
+            os.replace(tmp_path, file_path)
+        except IOError:
+            pass
+
+    def clear(self, clear_disk=True):
+        self.entries.clear()
+        self.hits = self.disk_hits = self.misses = 0
+        num_removed_files = 0
+        if clear_disk:
+            for file_path in self._list_disk_files():
+                try:
+                    os.remove(file_path)
+                    num_removed_files += 1
+                except IOError:
+                    pass
+        return num_removed_files
+
+    def stats(self):
+        disk_files = self._list_disk_files()
+        return {
+            "memory_entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "disk_dir": self.disk_dir,
+            "disk_entries": len(disk_files),
+            "disk_size": sum(os.path.getsize(f) for f in disk_files),
+        }
+
+    def _put_in_memory(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > max(self.max_entries, 0):
+            self.entries.popitem(last=False)
+
+    def _get_file_path(self, key):
+        return os.path.join(self.disk_dir, key + ".json")
+
+    def _list_disk_files(self):
+        if self.disk_dir is None or not os.path.isdir(self.disk_dir):
+            return []
+        return [os.path.join(self.disk_dir, f) for f in os.listdir(self.disk_dir) if f.endswith(".json")]
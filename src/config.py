@@ -1,6 +1,8 @@
 import sys
 import os
+import json
 import logging
+import importlib.util
 
 
 HELP_TEXT = """
@@ -68,12 +70,57 @@ def get_save_file_path():
     return os.path.join(parent_path, "original_html_texts.txt")
 
 
+def get_cache_dir(package_name):
+    parent_path = get_working_dir()
+    return os.path.join(parent_path, package_name + "_cache")
+
+
+# settings that only have side effects, and do not change the formatting result
+SIDE_EFFECT_SETTINGS = ["save_origins_to_file", "save_file_path", "save_compress", "save_max_bytes",
+                        "save_backup_count", "save_format", "use_cache", "cache_max_entries", "cache_on_disk",
+                        "live_preview", "live_preview_delay", "large_document_threshold",
+                        "log_max_lines"]
+
+
+def get_settings_key(settings):
+    """returns a text that is the same for all the settings that give the same formatting result"""
+    normalized = {k: v for k, v in settings.items() if k not in SIDE_EFFECT_SETTINGS}
+    return json.dumps(normalized, sort_keys=True)
+
+
+def lazy_import(module_name):
+    """returns the module, which is only executed when one of its attributes is accessed for the first time. Used for
+    the modules that are slow to import (bs4 and the modules that depend on it) and not needed to show the window"""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.find_spec(module_name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    loader.exec_module(module)
+    return module
+
+
 def get_default_settings():
     default_settings = {
             "clear_elements": True,
+            "clear_elements_tree_aware": True,
             "save_origins_to_file": False,
             "save_file_path": get_save_file_path(),
+            "save_compress": False,
+            "save_max_bytes": 0,
+            "save_backup_count": 3,
+            "save_format": "text",
             "indent_length": 4,
+            "live_preview": False,
+            "live_preview_delay": 700,
+            "large_document_threshold": 1000000,
+            "log_max_lines": 1000,
+            "parser": "html.parser",
+            "use_cache": False,
+            "cache_max_entries": 64,
+            "cache_on_disk": False,
             "pre_proc_clear_shopify_tags": False,
             "pre_proc_unwrap_without_class": False,
             "pre_proc_unwrap_without_class_affected": ["div", "span"],
@@ -0,0 +1,498 @@
+from enum import Enum
+from collections import namedtuple
+import re
+import logging
+import bs4
+import archive
+import tree_processing
+
+
+class Types(Enum):
+    START = 0
+    START_INV = 1
+    NEXT = 2
+    END = 3
+
+
+TYPE_TO_MARKER = {
+    Types.START: "###start###",
+    Types.START_INV: "###start_inv###",
+    Types.NEXT: "###next###",
+    Types.END: "###end###",
+}
+
+TYPES_MARKERS = {
+    "###start###": Types.START,
+    "###start_inv###": Types.START_INV,
+    "###next###": Types.NEXT,
+    "###end###": Types.END,
+}
+
+GENERATED_HTML = {
+    "start": '<div class="ss_container"><div class="ss_column_1">',
+    "start_inv": '<div class="ss_container"><div class="ss_column_2">',
+    "next": '</div><div class="ss_column_2">',
+    "next_inv": '</div><div class="ss_column_1">',
+    "end": '<div class="ss_end"></div></div></div>',
+}
+
+
+H6_ELEMENT_RE = re.compile(r"<h6[\s/>].*?</h6>", re.IGNORECASE | re.DOTALL)
+MARKERS_RE = re.compile("|".join(re.escape(marker) for marker in TYPES_MARKERS), re.IGNORECASE)
+
+# a tag, or a comment whose text is kept (the markers are searched in the strings of the tree, comments included)
+TAG_OR_COMMENT_RE = re.compile(r"<!--(.*?)-->|<[^>]*>", re.DOTALL)
+
+H6Span = namedtuple("H6Span", ["idx_start", "idx_end", "type"])
+
+
+def get_h6_text(h6_html):
+    """returns the text of the serialized <h6> element in which the markers are searched, as get_marker_types does
+    in the tree: its strings and comments, separated by a '<' where tags were (the attributes are not included)"""
+    return TAG_OR_COMMENT_RE.sub(lambda m: "<" if m.group(1) is None else f"<{m.group(1)}<", h6_html)
+
+
+def detect_marker_type(in_text, pos=0, endpos=None):
+    """returns the type of the marker contained in in_text[pos:endpos] (END > NEXT > START_INV > START if there are
+    many), or None if there is no marker"""
+    found = MARKERS_RE.findall(in_text, pos, len(in_text) if endpos is None else endpos)
+    if not found:
+        return None
+    return max((TYPES_MARKERS[marker.lower()] for marker in found), key=lambda t: t.value)
+
+
+def scan_h6_markers(in_html_text):
+    """finds all the <h6>...</h6> elements of in_html_text that contain a marker, in a single pass"""
+    markers = []
+    for m in H6_ELEMENT_RE.finditer(in_html_text):
+        h6_type = detect_marker_type(in_html_text, m.start(), m.end())
+        if h6_type is not None:
+            # the markers found in the span are checked again without the tags and their attributes
+            h6_type = detect_marker_type(get_h6_text(m.group()))
+        if h6_type is not None:
+            markers += [H6Span(m.start(), m.end(), h6_type)]
+    return markers
+
+
+def get_marker_types(tag):
+    """returns the set of the marker types found in the text of tag, without serializing it (a marker has to be in a
+    single string, as when searching the serialized tag)"""
+    found = set()
+    for element in tag.descendants:
+        if isinstance(element, bs4.NavigableString):
+            found.update(TYPES_MARKERS[marker.lower()] for marker in MARKERS_RE.findall(element))
+    return found
+
+
+class Header6:
+    def __init__(self):
+        self.idx_start = 0
+        self.idx_end = 0
+        self.text = ""
+        self.type = None
+
+    def detect_type(self):
+        self.type = detect_marker_type(self.text)
+        if isinstance(self.type, Enum):
+            return True
+        # return False, f"WARNING: No type detected for <h6> that starts at character {self.idx_start}"
+        return False
+
+
+STAGES = ["pre-processing", "merge repair", "validation", "rewrite"]
+
+
+class ProcessingCancelled(Exception):
+    pass
+
+
+class Message:
+    def __init__(self, text, level):
+        self.text = text
+        self.level = level
+
+
+class FormatResult:
+    def __init__(self):
+        self.html = ""
+        self.success = False
+        self.messages = []
+        self.window_message = ""
+        self.num_sequences = 0
+        self.num_cleared_h6 = 0
+        self.num_cleared_previous_html_elements = 0
+        self.num_line_breaks = 0
+        self.pre_processing_hits = {}
+        self.depth_offenders = []
+        self.cancelled = False
+
+
+def format_html(in_html_text, in_settings, log_callback=None, window_message_callback=None, cache=None,
+                progress_callback=None, is_cancelled=None, archive_writer=None):
+    """Formats in_html_text with the given settings (see config.get_default_settings()), and returns a FormatResult
+    holding the output HTML (empty on failure), the emitted messages and the counters of the run.
+    When a cache.ResultCache is given, an input already formatted with the same settings is not processed again,
+    its stored messages are forwarded to the callbacks instead.
+    progress_callback(stage_name, stage_idx, num_stages) is called at the start of each stage of STAGES, and
+    is_cancelled() is checked between stages: if it returns True, the result is returned with 'cancelled' set.
+    When an archive.ArchiveWriter is given, the original HTML is saved in its background thread (if the
+    'save_origins_to_file' setting is enabled), it is written before returning otherwise."""
+    html_processor = HtmlFormatterCore(log_callback, window_message_callback, progress_callback, is_cancelled,
+                                       archive_writer)
+    result = None
+    key = None
+    if cache is not None:
+        key = cache.get_key(in_html_text, in_settings)
+        result = cache.get(key)
+
+    if result is None:
+        settings = dict(in_settings)
+        if cache is not None:
+            settings["save_origins_to_file"] = False
+        try:
+            html_processor.process(in_html_text, settings)
+        except ProcessingCancelled:
+            html_processor.result = FormatResult()
+            html_processor.result.cancelled = True
+            html_processor._log("WARNING: processing cancelled", logging.WARNING)
+            return html_processor.result
+        result = html_processor.result
+        if cache is None:
+            return result
+        cache.put(key, result)
+    else:
+        for message in result.messages:
+            html_processor.forward_log(message.text, message.level)
+        html_processor.forward_log("formatting result loaded from cache", logging.DEBUG)
+        if result.window_message != "":
+            html_processor.forward_window_message(result.window_message)
+
+    # saving the original text is a side effect that is done for each run, even when the result comes from the cache
+    if in_settings["save_origins_to_file"]:
+        html_processor._append_to_file(in_settings["save_file_path"], in_html_text, result.success, in_settings)
+    return result
+
+
+class HtmlFormatterCore:
+    """Formatter that does not depend on Qt. Messages are stored in 'result' and forwarded to the optional
+    callbacks: log_callback(msg, log_lvl) and window_message_callback(msg). See format_html for progress_callback
+    and is_cancelled, 'process' raises ProcessingCancelled when the processing is cancelled."""
+    def __init__(self, log_callback=None, window_message_callback=None, progress_callback=None, is_cancelled=None,
+                 archive_writer=None):
+        self.log_callback = log_callback
+        self.window_message_callback = window_message_callback
+        self.progress_callback = progress_callback
+        self.is_cancelled = is_cancelled
+        self.archive_writer = archive_writer
+        self.result = FormatResult()
+        self.num_cleared_previous_html_elements = None
+        self.num_cleared_h6 = None
+        self.num_line_breaks = 0
+        self.parser = tree_processing.DEFAULT_PARSER
+
+    def _log(self, msg, log_lvl=logging.INFO):
+        self.result.messages += [Message(msg, log_lvl)]
+        self.forward_log(msg, log_lvl)
+
+    def _window_message(self, msg):
+        self.result.window_message = msg
+        self.forward_window_message(msg)
+
+    def forward_log(self, msg, log_lvl=logging.INFO):
+        if self.log_callback is not None:
+            self.log_callback(msg, log_lvl)
+
+    def forward_window_message(self, msg):
+        if self.window_message_callback is not None:
+            self.window_message_callback(msg)
+
+    def _check_cancelled(self):
+        if self.is_cancelled is not None and self.is_cancelled():
+            raise ProcessingCancelled()
+
+    def _start_stage(self, stage_name):
+        self._check_cancelled()
+        if self.progress_callback is not None:
+            self.progress_callback(stage_name, STAGES.index(stage_name), len(STAGES))
+
+    def process(self, in_html_text, in_settings):
+        self.result = FormatResult()
+        self.num_cleared_h6 = 0
+        self.num_cleared_previous_html_elements = 0
+        previous_type = Types.END
+
+        # the document is parsed once, every tree stage works on the same tree, and it is serialized only once
+        # before the markers are rewritten
+        self._start_stage("pre-processing")
+        self.parser = self._get_parser(in_settings)
+        doc = tree_processing.parse(in_html_text, self.parser)
+        doc = self._pre_processing_tree(doc, in_settings)
+        if in_settings["clear_elements"] and in_settings["clear_elements_tree_aware"]:
+            doc = self._remove_h6_elements_tree(doc)
+        elif in_settings["clear_elements"]:
+            doc = tree_processing.parse(self._remove_h6_elements(str(doc)), self.parser)
+        else:
+            doc = tree_processing.normalize_strings(doc)
+        self._start_stage("merge repair")
+        self._check_for_merged_h6_tags_tree(doc)
+        out_html_data = str(doc)
+        h6_elements = self._get_h6_html_data(out_html_data)
+        if in_settings["clear_elements"]:
+            self._log(f"Cleared '{len(h6_elements)}' h6 elements, '{self.num_line_breaks}'  line breaks and "
+                      f"'{self.num_cleared_previous_html_elements}' generated patterns", logging.INFO)
+
+        error_msg = "ERROR: wrong h6 sequence {}->{}. Possible sequences: START->NEXT->END or START_INV->NEXT->END."
+        window_msg = None
+
+        num_sequences = 0
+        is_ok = True
+        replacements = []
+
+        self._start_stage("validation")
+        self.result.depth_offenders = self.get_h6_depth_offenders(doc)
+        if len(self.result.depth_offenders) != 0:
+            error_msg = f"ERROR: h6 elements do not have the same depth."
+            window_msg = "<b>ERROR</b>: some <h6> tags do not have the appropriate depth in the HTML Tree:\n\n"
+            window_msg += self.get_h6_positions_report_str(doc)
+            window_msg += "\nElements that do not contain a multiple of 3 tags:\n"
+            window_msg += self.get_h6_depth_offenders_str(self.result.depth_offenders)
+            window_msg += "\nPlease correct the tags so that each 3 consecutive tags have in the same depth."
+            is_ok = False
+
+        self._start_stage("rewrite")
+        for h6_tag in h6_elements:
+            if not is_ok:
+                break
+
+            if h6_tag.type == Types.START:
+                replacements += [(h6_tag.idx_start, h6_tag.idx_end, GENERATED_HTML["start"])]
+                if previous_type != Types.END:
+                    error_msg = error_msg.format(previous_type, Types.START)
+                    is_ok = False
+            if h6_tag.type == Types.START_INV:
+                replacements += [(h6_tag.idx_start, h6_tag.idx_end, GENERATED_HTML["start_inv"])]
+                if previous_type != Types.END:
+                    error_msg = error_msg.format(previous_type, Types.START_INV)
+                    is_ok = False
+            if h6_tag.type == Types.NEXT:
+                if previous_type == Types.START:
+                    replacements += [(h6_tag.idx_start, h6_tag.idx_end, GENERATED_HTML["next"])]
+                elif previous_type == Types.START_INV:
+                    replacements += [(h6_tag.idx_start, h6_tag.idx_end, GENERATED_HTML["next_inv"])]
+                else:
+                    error_msg = error_msg.format(previous_type, Types.NEXT)
+                    is_ok = False
+            if h6_tag.type == Types.END:
+                replacements += [(h6_tag.idx_start, h6_tag.idx_end, GENERATED_HTML["end"])]
+                num_sequences += 1
+                if previous_type != Types.NEXT:
+                    error_msg = error_msg.format(previous_type, Types.END)
+                    is_ok = False
+            previous_type = h6_tag.type
+
+        if previous_type != Types.END:
+            is_ok = False
+            error_msg = "ERROR:  h6 sequence does not end with END tag. " \
+                        "Possible sequences: START->NEXT->END or START_INV->NEXT->END."
+
+        self.result.num_sequences = num_sequences
+        self.result.num_cleared_h6 = self.num_cleared_h6
+        self.result.num_cleared_previous_html_elements = self.num_cleared_previous_html_elements
+        self.result.num_line_breaks = self.num_line_breaks
+
+        if in_settings["save_origins_to_file"]:
+            self._append_to_file(in_settings["save_file_path"], in_html_text, is_ok, in_settings)
+
+        if not is_ok:
+            if window_msg is None:
+                window_msg = "<b>ERROR</b>: some <h6> tags do not have the appropriate order:\n\n"
+                window_msg += self.get_h6_positions_report_str(doc)
+                window_msg += "\nPlease correct the tags so that all sequences are as follows:\n" \
+                              "START->NEXT->END or START_INV->NEXT->END."
+            self._log(error_msg, logging.ERROR)
+            if window_msg != "":
+                self._window_message(window_msg)
+            return ""
+
+        out_html_data = self._replace_spans(out_html_data, replacements)
+        self._log("Successfully inserted '{}' two-columns sections (cleared '{}' previously generated HTML and '{}'"
+                  " h6 tags).".format(num_sequences, self.num_cleared_previous_html_elements, self.num_cleared_h6
+                                      ), logging.INFO)
+        self.result.html = out_html_data
+        self.result.success = True
+        return out_html_data
+
+    def _get_parser(self, in_settings):
+        parser = tree_processing.get_usable_parser(in_settings["parser"])
+        if parser != in_settings["parser"]:
+            self._log(f"WARNING: parser '{in_settings['parser']}' is not available, '{parser}' is used instead",
+                      logging.WARNING)
+        return parser
+
+    @staticmethod
+    def _as_tree(in_html, parser=tree_processing.DEFAULT_PARSER):
+        if isinstance(in_html, bs4.BeautifulSoup):
+            return in_html
+        return tree_processing.parse(in_html, parser)
+
+    @staticmethod
+    def get_h6_positions_report(in_html, parser=tree_processing.DEFAULT_PARSER):
+        """in_html can either be an HTML text or an already parsed document tree"""
+        doc = HtmlFormatterCore._as_tree(in_html, parser)
+        report = []
+        for match in doc.find_all("h6"):
+            found = get_marker_types(match)
+            for marker, marker_type in TYPES_MARKERS.items():
+                if marker_type in found:
+                    report_line = [marker]
+                    cur_tag = match
+                    while cur_tag:
+                        report_line += [cur_tag.name]
+                        cur_tag = cur_tag.parent
+                    report += [report_line]
+
+        return report
+
+    @staticmethod
+    def get_h6_positions_report_str(in_html, parser=tree_processing.DEFAULT_PARSER):
+        report_str = ""
+        for i, line in enumerate(HtmlFormatterCore.get_h6_positions_report(in_html, parser)):
+            parents = list(reversed(line))
+            report_str += f"{i}. Depth:{len(line) - 1}  =>  {' -> '.join(parents)}\n"
+        return report_str
+
+    def _check_for_merged_h6_tags(self, in_html_text):
+        doc = tree_processing.parse(in_html_text, self.parser)
+        self._check_for_merged_h6_tags_tree(doc)
+        return str(doc)
+
+    def _check_for_merged_h6_tags_tree(self, doc):
+        num_correction = 0
+        merged_h6_tags = []
+        for match in doc.find_all("h6"):
+            found = get_marker_types(match)
+            if Types.END not in found:
+                continue
+            for init_type in [Types.START, Types.START_INV]:
+                if init_type in found:
+                    init_marker = TYPE_TO_MARKER[init_type]
+                    new_div_before1 = doc.new_tag("h6")
+                    new_div_before1.string = "###end###"
+                    match.insert_before(new_div_before1)
+                    new_div_before2 = doc.new_tag("h6")
+                    new_div_before2.string = init_marker
+                    match.insert_before(new_div_before2)
+                    num_correction += 1
+            if Types.START in found or Types.START_INV in found:
+                merged_h6_tags += [match]
+
+        for match in merged_h6_tags:
+            match.decompose()
+
+        if num_correction != 0:
+            self._log(f"corrected {num_correction} merge start and end h6 tags", logging.INFO)
+        return doc
+
+    def _pre_processing(self, in_html_text, settings):
+        doc = tree_processing.parse(in_html_text, self.parser)
+        return str(self._pre_processing_tree(doc, settings))
+
+    def _pre_processing_tree(self, doc, settings):
+        doc, hits = tree_processing.pre_process(doc, settings, self._check_cancelled)
+        self.result.pre_processing_hits = hits
+        for rule_name, num_hits in hits.items():
+            self._log(f"pre-processing rule '{rule_name}' applied {num_hits} times", logging.DEBUG)
+
+        if len(hits) != 0:
+            self._log("pre-processing successful!", logging.INFO)
+        return doc
+
+    def _check_h6_depth_correctness(self, in_html_text):
+        return self._check_h6_depth_correctness_tree(tree_processing.parse(in_html_text, self.parser))
+
+    def _check_h6_depth_correctness_tree(self, doc):
+        return len(self.get_h6_depth_offenders(doc)) == 0
+
+    @staticmethod
+    def get_h6_depth_offenders(in_html, parser=tree_processing.DEFAULT_PARSER):
+        """Returns the elements whose number of marker <h6> children is not a multiple of 3, in document order, as
+        dicts: {"name", "path" (names from the root), "line", "column" (1-based, None if unknown), "num_markers"}.
+        The number of markers of each parent is counted in one pass over the <h6> elements."""
+        doc = HtmlFormatterCore._as_tree(in_html, parser)
+        num_markers = {}
+        parents = []
+        for match in doc.find_all("h6"):
+            if not get_marker_types(match):
+                continue
+            if id(match.parent) not in num_markers:
+                num_markers[id(match.parent)] = 0
+                parents += [match.parent]
+            num_markers[id(match.parent)] += 1
+
+        offenders = []
+        for parent in parents:
+            if num_markers[id(parent)] % 3 == 0:
+                continue
+            path = [parent.name] + [p.name for p in parent.parents]
+            offenders += [{"name": parent.name, "path": list(reversed(path)), "line": parent.sourceline,
+                           "column": None if parent.sourcepos is None else parent.sourcepos + 1,
+                           "num_markers": num_markers[id(parent)]}]
+        return offenders
+
+    @staticmethod
+    def get_h6_depth_offenders_str(offenders):
+        offenders_str = ""
+        for offender in offenders:
+            position = "" if offender["line"] is None else f" at line {offender['line']}, column {offender['column']}"
+            offenders_str += f"- {' -> '.join(offender['path'])}{position}: " \
+                             f"{offender['num_markers']} marker tags\n"
+        return offenders_str
+
+    @staticmethod
+    def _get_h6_html_data(in_html_text):
+        return scan_h6_markers(in_html_text)
+
+    @staticmethod
+    def _replace_spans(in_html_text, spans):
+        """Replaces each (idx_start, idx_end, new_text) span of in_html_text in a single pass. The spans have to be
+        sorted by idx_start, a span overlapping an already replaced one is ignored."""
+        parts = []
+        pos = 0
+        for idx_start, idx_end, new_text in spans:
+            if idx_start < pos or idx_end <= idx_start:
+                continue
+            parts += [in_html_text[pos:idx_start], new_text]
+            pos = idx_end
+        parts += [in_html_text[pos:]]
+        return "".join(parts)
+
+    @staticmethod
+    def _replace_substring(in_old, in_idx_start, in_idx_end, in_new_char):
+        return in_old[:in_idx_start] + in_new_char + in_old[in_idx_end + 1:]
+
+    def _remove_h6_elements(self, in_html_data):
+        out_html_data, num_ss_divs, num_line_breaks = tree_processing.clear_generated_html(in_html_data)
+        self.num_line_breaks = num_line_breaks
+        self.num_cleared_previous_html_elements = num_ss_divs
+        return out_html_data
+
+    def _remove_h6_elements_tree(self, doc):
+        """Tree version of '_remove_h6_elements': the generated wrappers are unwrapped wherever they are in the tree
+        (the text inside comments or scripts is not modified), and line breaks are removed directly from the text
+        nodes and attributes values"""
+        self.num_cleared_previous_html_elements = tree_processing.unwrap_generated_wrappers(doc)
+        self.num_line_breaks = tree_processing.remove_line_breaks(doc)
+        return tree_processing.normalize_strings(doc)
+
+    def _append_to_file(self, file_path, original_html, is_ok, in_settings):
+        if file_path == "":
+            return
+        if self.archive_writer is not None:
+            self.archive_writer.write(file_path, original_html, is_ok, in_settings)
+            return
+
+        try:
+            archive.save_original(file_path, original_html, is_ok, **archive.get_write_options(in_settings))
+            self._log("Successfully written original HTML to 'save file'", logging.INFO)
+        except archive.WRITE_ERRORS:
+            self._log(f"WARNING: Could not write to file {file_path}.", logging.WARNING)
@@ -0,0 +1,261 @@
+import html.parser
+import uuid
+import bs4.builder
+import config
+import core
+
+
+# elements that are closed as soon as they are opened by the html.parser tree builder
+EMPTY_ELEMENTS = bs4.builder.HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS
+
+# size of the blocks compared when looking for the common beginning or end of two texts
+COMPARE_BLOCK_SIZE = 4096
+
+
+def common_prefix_length(a, b):
+    """returns the length of the common beginning of a and b, comparing blocks of characters before single ones"""
+    n = min(len(a), len(b))
+    i = 0
+    while i + COMPARE_BLOCK_SIZE <= n and a[i:i + COMPARE_BLOCK_SIZE] == b[i:i + COMPARE_BLOCK_SIZE]:
+        i += COMPARE_BLOCK_SIZE
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def common_suffix_length(a, b, max_length):
+    """returns the length of the common end of a and b, at most max_length"""
+    n = min(len(a), len(b), max_length)
+    i = 0
+    while i + COMPARE_BLOCK_SIZE <= n and a[len(a) - i - COMPARE_BLOCK_SIZE:len(a) - i] == \
+            b[len(b) - i - COMPARE_BLOCK_SIZE:len(b) - i]:
+        i += COMPARE_BLOCK_SIZE
+    while i < n and a[len(a) - i - 1] == b[len(b) - i - 1]:
+        i += 1
+    return i
+
+
+class SplitPoint:
+    """position right after the closing tag of an <h6> element that only holds an END marker. stack holds the open
+    elements at this position as (name, position of the start tag) tuples, the last one is the parent of the <h6>"""
+    def __init__(self, position, stack):
+        self.position = position
+        self.stack = stack
+
+
+class _StopScanning(Exception):
+    pass
+
+
+class SplitScanner(html.parser.HTMLParser):
+    """Tokenizes the text as the html.parser tree builder does, only keeping track of the open elements, and lists
+    the split points. The scan can start after a known split point (its text being given from this point, with the
+    open elements at this point), and stops as soon as a split point matches one of the previous scan (resync), as
+    the rest of the scan would give the same split points."""
+    def __init__(self, text, start=0, stack=(), resync=None):
+        super().__init__(convert_charrefs=False)
+        self.text = text
+        self.start = start
+        self.stack = list(stack)
+        self.resync = resync
+        self.resync_point = None
+        self.points = []
+        self.h6_start = next((position for name, position in self.stack if name == "h6"), None)
+        self.line_number = 1
+        self.line_start = start
+
+    def _position(self):
+        line_number, column = self.getpos()
+        while self.line_number < line_number:
+            self.line_start = self.text.index("\n", self.line_start) + 1
+            self.line_number += 1
+        return self.line_start + column
+
+    def scan(self):
+        try:
+            self.feed(self.text[self.start:])
+            self.close()
+        except _StopScanning:
+            pass
+        return self.points
+
+    def handle_starttag(self, tag, attrs):
+        if tag in EMPTY_ELEMENTS:
+            return
+        position = self._position()
+        self.stack += [(tag, position)]
+        if tag == "h6" and self.h6_start is None:
+            self.h6_start = position
+
+    def handle_endtag(self, tag):
+        idx = len(self.stack) - 1
+        while idx >= 0 and self.stack[idx][0] != tag:
+            idx -= 1
+        if idx < 0:
+            # end tag without a start tag, ignored
+            return
+        closed_h6 = self.h6_start is not None and any(position == self.h6_start for _, position in self.stack[idx:])
+        del self.stack[idx:]
+        if not closed_h6:
+            return
+        if tag != "h6":
+            # the <h6> element is closed by the end tag of one of its parents
+            self.h6_start = None
+            return
+        end_position = self.text.index(">", self._position()) + 1
+        h6_text = self.text[self.h6_start:end_position]
+        self.h6_start = None
+        markers = core.MARKERS_RE.findall(core.get_h6_text(h6_text))
+        if len(markers) != 1 or core.TYPES_MARKERS[markers[0].lower()] != core.Types.END:
+            return
+        point = SplitPoint(end_position, tuple(self.stack))
+        if self.resync is not None and self.resync(point):
+            self.resync_point = point
+            raise _StopScanning()
+        self.points += [point]
+
+
+class IncrementalFormatter:
+    """Formats successive versions of a document (for example while it is edited) reusing the results of the
+    unchanged regions. The document is split right after the END <h6> elements of the element that holds the most
+    two-columns sections: each region between two split points is a balanced fragment that gives the same output when
+    formatted alone, and the text before the first split point and after the last one is formatted as a document with
+    a placeholder comment where the regions go. Only the regions that changed since the previous version are formatted
+    again, and the split points are only searched again from the first change until they match the previous ones.
+    Documents that cannot be split (other parsers than html.parser, <h6> tags grouped by the pre-processing, or the
+    unwrap_without_class rule, which depends on the parent of the top level tags of a region) are formatted as a
+    whole. The messages of the runs are not forwarded: this formatter is meant for previews."""
+    def __init__(self):
+        self.text = ""
+        self.points = []
+        self.settings_key = None
+        self.results = {}
+        self.placeholder = self._new_placeholder()
+        self.num_regions = 0
+        self.num_formatted_regions = 0
+
+    @staticmethod
+    def _new_placeholder():
+        return f"<!--live-preview-{uuid.uuid4().hex}-->"
+
+    @staticmethod
+    def can_split(in_settings):
+        if in_settings["parser"] != "html.parser":
+            return False
+        if in_settings["pre_proc_unwrap_without_class"]:
+            # the rule depends on the parent of each tag, which is the document for the top level tags of a region
+            return False
+        return not (in_settings["pre_proc_group_consecutive"] and
+                    "h6" in in_settings["pre_proc_group_consecutive_affected"])
+
+    def get_split_points(self, in_html_text):
+        """returns the split points of in_html_text, scanning again only the text that changed since the previous
+        call"""
+        old_text, old_points = self.text, self.points
+        prefix = common_prefix_length(old_text, in_html_text)
+        suffix = common_suffix_length(old_text, in_html_text, min(len(old_text), len(in_html_text)) - prefix)
+        delta = len(in_html_text) - len(old_text)
+        new_suffix_start = len(in_html_text) - suffix
+
+        kept = [p for p in old_points if p.position <= prefix]
+        old_by_position = {p.position: i for i, p in enumerate(old_points) if p.position >= len(old_text) - suffix}
+
+        def to_old_stack(stack):
+            old_stack = []
+            for name, position in stack:
+                if position < prefix:
+                    old_stack += [(name, position)]
+                elif position >= new_suffix_start:
+                    old_stack += [(name, position - delta)]
+                else:
+                    return None
+            return tuple(old_stack)
+
+        def resync(point):
+            idx = old_by_position.get(point.position - delta) if point.position >= new_suffix_start else None
+            return idx is not None and old_points[idx].stack == to_old_stack(point.stack)
+
+        start, stack = (kept[-1].position, kept[-1].stack) if kept else (0, ())
+        scanner = SplitScanner(in_html_text, start, stack, resync if old_by_position else None)
+        points = kept + scanner.scan()
+        if scanner.resync_point is not None:
+            points += [scanner.resync_point]
+            idx = old_by_position[scanner.resync_point.position - delta]
+
+            def shift(position):
+                return position + delta if position >= len(old_text) - suffix else position
+            points += [SplitPoint(shift(p.position), tuple((name, shift(pos)) for name, pos in p.stack))
+                       for p in old_points[idx + 1:]]
+        self.text, self.points = in_html_text, points
+        return points
+
+    def get_regions(self, in_html_text):
+        """returns the text of the document with a placeholder instead of the regions, and the list of the regions"""
+        points = self.get_split_points(in_html_text)
+        parents = {}
+        for point in points:
+            parents.setdefault(point.stack, []).append(point.position)
+        if not parents:
+            return in_html_text, []
+        positions = max(parents.values(), key=len)
+        if len(positions) < 2:
+            return in_html_text, []
+        while self.placeholder in in_html_text:
+            self.placeholder = self._new_placeholder()
+        regions = [in_html_text[positions[i]:positions[i + 1]] for i in range(len(positions) - 1)]
+        return in_html_text[:positions[0]] + self.placeholder + in_html_text[positions[-1]:], regions
+
+    def format(self, in_html_text, in_settings, is_cancelled=None):
+        """returns the core.FormatResult of in_html_text (without messages), as core.format_html would, the original
+        text is never saved"""
+        settings = dict(in_settings, save_origins_to_file=False)
+        settings_key = config.get_settings_key(settings)
+        if settings_key != self.settings_key:
+            self.results = {}
+            self.settings_key = settings_key
+        if self.can_split(settings):
+            document, regions = self.get_regions(in_html_text)
+        else:
+            document, regions = in_html_text, []
+
+        results = {}
+        self.num_regions = len(regions)
+        self.num_formatted_regions = 0
+        for text in [document] + regions:
+            if text in results:
+                continue
+            result = self.results.get(text)
+            if result is None:
+                if is_cancelled is not None and is_cancelled():
+                    result = core.FormatResult()
+                    result.cancelled = True
+                    return result
+                result = core.format_html(text, settings, is_cancelled=is_cancelled)
+                if result.cancelled:
+                    return result
+                self.num_formatted_regions += 1
+            results[text] = result
+            if not result.success:
+                # the results computed so far are kept for the next version
+                self.results.update(results)
+                return result
+        # only the results of the current version are kept
+        self.results = results
+        if regions and self.placeholder not in results[document].html:
+            return core.format_html(in_html_text, settings, is_cancelled=is_cancelled)
+        return self._merge_results(results[document], [results[text] for text in regions])
+
+    def _merge_results(self, document_result, region_results):
+        if not region_results:
+            return document_result
+        merged = core.FormatResult()
+        merged.success = True
+        merged.html = document_result.html.replace(self.placeholder, "".join(r.html for r in region_results), 1)
+        for result in [document_result] + region_results:
+            merged.num_sequences += result.num_sequences
+            merged.num_cleared_h6 += result.num_cleared_h6
+            merged.num_cleared_previous_html_elements += result.num_cleared_previous_html_elements
+            merged.num_line_breaks += result.num_line_breaks
+            for rule_name, hits in result.pre_processing_hits.items():
+                merged.pre_processing_hits[rule_name] = merged.pre_processing_hits.get(rule_name, 0) + hits
+        return merged
@@ -2,10 +2,21 @@
 import PySide6.QtGui as Qg
 import binascii
 import zlib
+import struct
 import argparse
 from os import path
 
 
+# optional file written by the build step (-b), holds the icons already decoded, see build_binary_icons
+BINARY_ICONS_PATH = path.join(path.dirname(path.abspath(__file__)), "qt_icons.bin")
+BINARY_ICONS_MAGIC = b"QTICONS1"
+BINARY_IMAGE_FORMAT = Qg.QImage.Format.Format_ARGB32_Premultiplied
+
+# decoded icons, by name of their text image
+_icons = {}
+_binary_icons = None
+
+
 APP_ICON = """
 eJxUemVUXT3Q7j64c3ArUqRAsYO7a6FIixeH4u4OBy8Oxa04FIfi7tDi7u7urh/vXeu7694fydrZycw8e2dmMpMkVElBGh2FGAUAAPRPMhJfAQAE/FeQEN5q
 Bufks7cWsp2MpiMAHPH8V0D2DANvDwCRk6SGk7KtiZOrgYMx4OrqymxuY+loZGBnzGzrYJp2IkAMABTAJwlRFbf0Ix1XN1zVWx/TutOCWwW67NtUMWyxfn99
@@ -728,6 +739,78 @@ def qt_icon_from_text_image(img_text):
     return icon
 
 
+def get_icon_names():
+    return [name for name, value in globals().items() if name.endswith("_ICON") and isinstance(value, str)]
+
+
+def build_binary_icons(out_path=BINARY_ICONS_PATH):
+    """writes all the icons decoded as raw pixels, with the checksum of their text image (an icon whose text image
+    changed since the build is decoded from its text image again)"""
+    names = get_icon_names()
+    with open(out_path, 'wb') as fd:
+        fd.write(BINARY_ICONS_MAGIC + struct.pack("<I", len(names)))
+        for name in names:
+            image = Qg.QImage.fromData(text_image_to_bytes(globals()[name])).convertToFormat(BINARY_IMAGE_FORMAT)
+            data = bytes(image.constBits())[:image.sizeInBytes()]
+            encoded_name = name.encode("ascii")
+            fd.write(struct.pack("<H", len(encoded_name)) + encoded_name)
+            fd.write(struct.pack("<5I", zlib.crc32(globals()[name].encode("ascii")), image.width(), image.height(),
+                                 image.bytesPerLine(), len(data)))
+            fd.write(data)
+    return names
+
+
+def _read_binary_icons():
+    """returns the icons of the build step file by name, as (checksum, width, height, bytes per line, pixels)"""
+    if not path.isfile(BINARY_ICONS_PATH):
+        return {}
+    with open(BINARY_ICONS_PATH, 'rb') as fd:
+        content = fd.read()
+    if not content.startswith(BINARY_ICONS_MAGIC):
+        return {}
+    icons = {}
+    idx = len(BINARY_ICONS_MAGIC) + 4
+    try:
+        for _ in range(struct.unpack_from("<I", content, len(BINARY_ICONS_MAGIC))[0]):
+            name_length, = struct.unpack_from("<H", content, idx)
+            name = content[idx + 2:idx + 2 + name_length].decode("ascii")
+            idx += 2 + name_length
+            checksum, width, height, bytes_per_line, size = struct.unpack_from("<5I", content, idx)
+            idx += 20
+            data = content[idx:idx + size]
+            idx += size
+            if len(data) != size or bytes_per_line < 4 * width or size < bytes_per_line * height:
+                raise ValueError(f"inconsistent pixels size for {name}")
+            icons[name] = (checksum, width, height, bytes_per_line, data)
+    except (struct.error, UnicodeDecodeError, ValueError):
+        # truncated or corrupted file, the icons are decoded from their text images
+        return {}
+    return icons
+
+
+def _load_pixmap(name):
+    global _binary_icons
+    if _binary_icons is None:
+        _binary_icons = _read_binary_icons()
+    img_text = globals()[name]
+    entry = _binary_icons.get(name)
+    if entry is not None and entry[0] == zlib.crc32(img_text.encode("ascii")):
+        _, width, height, bytes_per_line, data = entry
+        return Qg.QPixmap.fromImage(Qg.QImage(data, width, height, bytes_per_line, BINARY_IMAGE_FORMAT))
+    qp = Qg.QPixmap()
+    qp.loadFromData(text_image_to_bytes(img_text))
+    return qp
+
+
+def get_icon(name):
+    """returns the icon of the text image named name (e.g. "APP_ICON"), decoded the first time it is requested only"""
+    icon = _icons.get(name)
+    if icon is None:
+        icon = Qg.QIcon(_load_pixmap(name))
+        _icons[name] = icon
+    return icon
+
+
 def save_icon_as_png(in_icon_data, in_png_path):
     icon_data = text_image_to_bytes(in_icon_data)
     with open(in_png_path, 'wb') as fd:
@@ -745,16 +828,23 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
                                      description='Convert image to text files. Which can be embedded in python'
                                                  'scripts to use as Qt icons')
-    parser.add_argument('-i', '--input', help='path to the input image file', type=str, metavar='\b', required=True)
+    parser.add_argument('-i', '--input', help='path to the input image file', type=str, default="", metavar='\b')
     parser.add_argument('-s', '--seperator', help='seperator used to separate line in the text file', type=str,
                         default="\n", metavar='\b')
     parser.add_argument('-l', '--line_size', help='number of characters per line', type=int,
                         default=120, metavar='\b')
     parser.add_argument('-o', '--output', help='output a text file, otherwise display text', type=boolean_string,
                         default=True, metavar='\b')
+    parser.add_argument('-b', '--build', help=f'write the decoded icons to {path.basename(BINARY_ICONS_PATH)}, which '
+                                              f'is then loaded instead of decoding the text images',
+                        type=boolean_string, default=False, metavar='\b')
 
     args = parser.parse_args()
 
+    if args.build:
+        print(f"Wrote {len(build_binary_icons())} icons to: {BINARY_ICONS_PATH}")
+        exit(0)
+
     if not path.isfile(args.input):
         print(f"No file found under: {args.input}")
         exit(0)
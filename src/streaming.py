@@ -0,0 +1,328 @@
+import collections
+import html
+import html.parser
+import logging
+import os
+import core
+import tree_processing
+
+
+# elements that never have an end tag, they are not pushed on the stack of open elements
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source",
+                 "track", "wbr"}
+
+ASCII_SPACES = " \t\n\r\f"
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+def _is_generated_wrapper(tag, attrs):
+    if tag != "div":
+        return False
+    return any(c in tree_processing.GENERATED_CLASSES for name, value in attrs if name == "class"
+               for c in (value or "").split())
+
+
+class _StopStreaming(Exception):
+    pass
+
+
+class _OpenElement:
+    __slots__ = ["name", "position", "dropped", "num_markers"]
+
+    def __init__(self, name, position, dropped=False):
+        self.name = name
+        self.position = position
+        self.dropped = dropped
+        self.num_markers = 0
+
+
+class StreamingFormatter(html.parser.HTMLParser):
+    """Formatter that reads the input by chunks and writes the output as soon as it is known, so that the memory used
+    does not depend on the size of the document (only on the size of the largest <h6> element). The text is copied
+    as is, except for the marker <h6> elements which are replaced by the generated HTML, and for the line breaks
+    (outside of <pre> and <textarea>) and previously generated <div> elements when 'clear_elements' is enabled.
+    The START->NEXT->END sequences and the depth rule (the number of markers in each element is a multiple of 3) are
+    checked while reading. The pre-processing rules need the whole tree, they are not supported in this mode.
+    The stack of open elements is the path of the tree that html.parser builds: the elements whose end tag is
+    omitted (e.g. <p>, <li>) stay open until an ancestor is closed, so the stack grows with them (one small object per
+    element, and each end tag only costs the elements it closes)."""
+    def __init__(self, out_file, in_settings, messenger):
+        super().__init__(convert_charrefs=False)
+        self.out_file = out_file
+        self.clear_elements = in_settings["clear_elements"]
+        self.messenger = messenger
+        self.stack = [_OpenElement("[document]", (1, 0))]
+        # number of open elements by name, so that an end tag without a start tag is detected without a stack scan
+        self.open_counts = collections.Counter()
+        self.h6_parts = None
+        self.h6_element = None
+        self.num_preserve_whitespace = 0
+        self.pending_space = None
+        self.in_text = False
+        self.previous_type = core.Types.END
+        self.error_msg = None
+        self.window_msg = None
+        self.num_markers = 0
+        self.num_sequences = 0
+        self.num_corrections = 0
+        self.num_line_breaks = 0
+        self.num_cleared_previous_html_elements = 0
+
+    def _emit(self, text):
+        if self.clear_elements and self.num_preserve_whitespace == 0 and "\n" in text:
+            self.num_line_breaks += text.count("\n")
+            text = text.replace("\n", "")
+        if self.h6_parts is not None:
+            self.h6_parts += [text]
+        else:
+            self.out_file.write(text)
+
+    def _flush_space(self):
+        """ends the current text (called for each event that is not a part of a text), the pending whitespace text is
+        written collapsed as the tree mode does for a text that only has whitespaces (a line break or a space, and the
+        line break is then cleared)"""
+        self.in_text = False
+        if self.pending_space is None:
+            return
+        space = self.pending_space
+        self.pending_space = None
+        self.num_line_breaks += space.count("\n")
+        self._emit("" if "\n" in space else " ")
+
+    def _handle_text(self, text, is_space):
+        """a text can be given in several parts (split at the chunk boundaries and the references), its parts are
+        kept while they only hold whitespaces, then written as they come once the text has another character"""
+        if not self.clear_elements or self.num_preserve_whitespace != 0 or self.in_text:
+            self._emit(text)
+            return
+        if is_space:
+            self.pending_space = (self.pending_space or "") + text
+            return
+        if self.pending_space is not None:
+            text = self.pending_space + text
+            self.pending_space = None
+        self.in_text = True
+        self._emit(text)
+
+    def _fail(self, error_msg, window_msg):
+        self.error_msg = error_msg
+        self.window_msg = window_msg
+        raise _StopStreaming()
+
+    def _position_str(self, position):
+        return f"line {position[0]}, column {position[1] + 1}"
+
+    def _push(self, name, dropped=False):
+        self.stack += [_OpenElement(name, self.getpos(), dropped)]
+        self.open_counts[name] += 1
+        if name in tree_processing.PRESERVE_WHITESPACE_TAGS:
+            self.num_preserve_whitespace += 1
+
+    def _pop(self):
+        element = self.stack.pop()
+        self.open_counts[element.name] -= 1
+        if element.name in tree_processing.PRESERVE_WHITESPACE_TAGS:
+            self.num_preserve_whitespace -= 1
+        if element.num_markers % 3 != 0:
+            self._fail("ERROR: h6 elements do not have the same depth.",
+                       f"<b>ERROR</b>: the element &lt;{element.name}&gt; that starts at "
+                       f"{self._position_str(element.position)} contains {element.num_markers} marker <h6> tags.\n\n"
+                       f"Please correct the tags so that each 3 consecutive tags have in the same depth.")
+        if element is self.h6_element:
+            self._finish_h6()
+        return element
+
+    def _parent_element(self):
+        for element in reversed(self.stack):
+            if not element.dropped:
+                return element
+
+    def _finish_h6(self):
+        position = self.h6_element.position
+        h6_text = "".join(self.h6_parts)
+        self.h6_parts = None
+        self.h6_element = None
+        found = {core.TYPES_MARKERS[marker.lower()] for marker in core.MARKERS_RE.findall(core.get_h6_text(h6_text))}
+        if not found:
+            self._emit(h6_text)
+            return
+        if core.Types.END in found and (core.Types.START in found or core.Types.START_INV in found):
+            # merged START and END tags, as repaired in the tree mode
+            self.num_corrections += 1
+            h6_types = [core.Types.END, core.Types.START if core.Types.START in found else core.Types.START_INV]
+        else:
+            h6_types = [max(found, key=lambda t: t.value)]
+        self._parent_element().num_markers += len(h6_types)
+        for h6_type in h6_types:
+            self._emit(self._get_generated_html(h6_type, position))
+
+    def _get_generated_html(self, h6_type, position):
+        self.num_markers += 1
+        error_msg = "ERROR: wrong h6 sequence {}->{}. Possible sequences: START->NEXT->END or START_INV->NEXT->END."
+        is_ok = True
+        if h6_type == core.Types.START:
+            new_text = core.GENERATED_HTML["start"]
+            is_ok = self.previous_type == core.Types.END
+        elif h6_type == core.Types.START_INV:
+            new_text = core.GENERATED_HTML["start_inv"]
+            is_ok = self.previous_type == core.Types.END
+        elif h6_type == core.Types.NEXT:
+            new_text = core.GENERATED_HTML["next" if self.previous_type == core.Types.START else "next_inv"]
+            is_ok = self.previous_type in [core.Types.START, core.Types.START_INV]
+        else:
+            new_text = core.GENERATED_HTML["end"]
+            is_ok = self.previous_type == core.Types.NEXT
+            self.num_sequences += 1
+        if not is_ok:
+            self._fail(error_msg.format(self.previous_type, h6_type),
+                       f"<b>ERROR</b>: the <h6> tag {core.TYPE_TO_MARKER[h6_type]} at {self._position_str(position)} "
+                       f"follows a {core.TYPE_TO_MARKER[self.previous_type]} tag.\n\n"
+                       f"Please correct the tags so that all sequences are as follows:\n"
+                       f"START->NEXT->END or START_INV->NEXT->END.")
+        self.previous_type = h6_type
+        return new_text
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_space()
+        if self.clear_elements and _is_generated_wrapper(tag, attrs):
+            self.num_cleared_previous_html_elements += 1
+            self._push(tag, dropped=True)
+            return
+        is_h6 = tag == "h6" and self.h6_parts is None
+        if is_h6:
+            self.h6_parts = []
+        self._emit(self.get_starttag_text())
+        if tag not in VOID_ELEMENTS:
+            self._push(tag)
+            if is_h6:
+                self.h6_element = self.stack[-1]
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush_space()
+        self._emit(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        self._flush_space()
+        if self.open_counts[tag] == 0:
+            # end tag without a start tag
+            self._emit(f"</{tag}>")
+            return
+        while True:
+            element = self.stack[-1]
+            if element.name == tag:
+                # the end tag is written before the <h6> element is complete
+                if not element.dropped:
+                    self._emit(f"</{tag}>")
+                self._pop()
+                return
+            self._pop()
+
+    def handle_data(self, data):
+        self._handle_text(data, data.strip(ASCII_SPACES) == "")
+
+    def handle_entityref(self, name):
+        self._handle_reference(f"&{name};")
+
+    def handle_charref(self, name):
+        self._handle_reference(f"&#{name};")
+
+    def _handle_reference(self, text):
+        # the tree mode gets the referenced character, a reference to a whitespace is written as this whitespace
+        character = html.unescape(text)
+        if character != text and character.strip(ASCII_SPACES) == "":
+            self.handle_data(character)
+        else:
+            self._handle_text(text, False)
+
+    def handle_comment(self, data):
+        self._flush_space()
+        self._emit(f"<!--{data}-->")
+
+    def handle_decl(self, decl):
+        self._flush_space()
+        self._emit(f"<!{decl}>")
+
+    def handle_pi(self, data):
+        self._flush_space()
+        self._emit(f"<?{data}>")
+
+    def unknown_decl(self, data):
+        self._flush_space()
+        self._emit(f"<![{data}]>")
+
+    def finish(self):
+        self.close()
+        self._flush_space()
+        while self.stack:
+            self._pop()
+        if self.previous_type != core.Types.END:
+            self._fail("ERROR:  h6 sequence does not end with END tag. "
+                       "Possible sequences: START->NEXT->END or START_INV->NEXT->END.",
+                       "<b>ERROR</b>: the last two-columns section is not closed with a ###end### <h6> tag.")
+
+
+def format_stream(in_file, out_file, in_settings, log_callback=None, window_message_callback=None,
+                  is_cancelled=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Streaming version of core.format_html: reads the text file object in_file by chunks of chunk_size characters
+    and writes the formatted HTML to out_file. The returned core.FormatResult does not hold the output HTML. When the
+    formatting fails (or is cancelled), the content written to out_file is incomplete and has to be discarded.
+    is_cancelled() is checked between chunks."""
+    messenger = core.HtmlFormatterCore(log_callback, window_message_callback, is_cancelled=is_cancelled)
+    for rule_name, enabled_key, _ in tree_processing.PRE_PROCESSING_RULES:
+        if in_settings[enabled_key]:
+            messenger._log(f"WARNING: pre-processing rule '{rule_name}' is not supported in streaming mode, "
+                           f"it is ignored", logging.WARNING)
+    if in_settings["save_origins_to_file"]:
+        messenger._log("WARNING: saving the original HTML is not supported in streaming mode", logging.WARNING)
+
+    parser = StreamingFormatter(out_file, in_settings, messenger)
+    try:
+        while True:
+            messenger._check_cancelled()
+            chunk = in_file.read(chunk_size)
+            if not chunk:
+                break
+            parser.feed(chunk)
+        parser.finish()
+    except _StopStreaming:
+        messenger._log(parser.error_msg, logging.ERROR)
+        messenger._window_message(parser.window_msg)
+        return messenger.result
+    except core.ProcessingCancelled:
+        messenger.result.cancelled = True
+        messenger._log("WARNING: processing cancelled", logging.WARNING)
+        return messenger.result
+
+    result = messenger.result
+    result.num_sequences = parser.num_sequences
+    result.num_cleared_previous_html_elements = parser.num_cleared_previous_html_elements
+    result.num_line_breaks = parser.num_line_breaks
+    if parser.num_corrections != 0:
+        messenger._log(f"corrected {parser.num_corrections} merge start and end h6 tags", logging.INFO)
+    if in_settings["clear_elements"]:
+        messenger._log(f"Cleared '{parser.num_markers}' h6 elements, '{parser.num_line_breaks}'  line breaks and "
+                       f"'{parser.num_cleared_previous_html_elements}' generated patterns", logging.INFO)
+    messenger._log("Successfully inserted '{}' two-columns sections (cleared '{}' previously generated HTML and '{}'"
+                   " h6 tags).".format(parser.num_sequences, parser.num_cleared_previous_html_elements, 0),
+                   logging.INFO)
+    result.success = True
+    return result
+
+
+def format_file(in_path, out_path, in_settings, log_callback=None, window_message_callback=None, is_cancelled=None,
+                chunk_size=DEFAULT_CHUNK_SIZE):
+    """formats the file in_path into out_path with format_stream, out_path is only written if the formatting
+    succeeded"""
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    result = None
+    try:
+        with open(in_path, 'r', encoding='utf8') as in_file, open(tmp_path, 'w', encoding='utf8') as out_file:
+            result = format_stream(in_file, out_file, in_settings, log_callback, window_message_callback,
+                                   is_cancelled, chunk_size)
+        if result.success:
+            os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return result
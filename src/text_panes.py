@@ -0,0 +1,149 @@
+import re
+import PySide6.QtCore as Qc
+import PySide6.QtGui as Qg
+import PySide6.QtWidgets as Qw
+import config
+
+live = config.lazy_import("live")
+
+
+# number of characters added to the view of a large document at a time
+CHUNK_SIZE = 1 << 16
+
+# a chunk is loaded when the view is scrolled at less than this number of pages from its end
+LOAD_MARGIN_PAGES = 2
+
+# in the view of a large document, longer lines are broken after a '>', Qt being slow with very long lines
+VIEW_LINE_LENGTH = 1000
+VIEW_LINE_RE = re.compile(r"[^\n]{%d,}?>|[^\n]+" % VIEW_LINE_LENGTH)
+
+
+def utf16_length(text):
+    """returns the length of text in UTF-16 code units, the unit of the positions in a Qt document"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+class LargeTextEdit(Qw.QPlainTextEdit):
+    """QPlainTextEdit with a large-document mode: a text longer than large_threshold characters is kept in a single
+    Python string (the backing buffer), and the pane only shows its beginning, loading the next chunks while it is
+    scrolled. The view of a large document is read-only, and its long lines are broken (the text selected in the view
+    can differ from the backing buffer, which is the text to copy). The full text has to be accessed with text() and
+    set_text() instead of toPlainText() and setPlainText(), so that it is never copied from or to the Qt document.
+    A large_threshold of 0 disables the large-document mode. 'large_document' is emitted with the length of the text
+    each time a large document is set."""
+    large_document = Qc.Signal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.large_threshold = 0
+        self.large_text = None
+        self.num_loaded = 0
+        self.editable = True
+        self.verticalScrollBar().valueChanged.connect(self._load_visible_chunks)
+        self.horizontalScrollBar().valueChanged.connect(self._load_visible_chunks)
+
+    def is_large(self):
+        return self.large_text is not None
+
+    def text(self):
+        if self.large_text is not None:
+            return self.large_text
+        return self.toPlainText()
+
+    def set_text(self, text):
+        if 0 < self.large_threshold < len(text):
+            self._set_large_text(text)
+            return
+        self._leave_large_mode()
+        self.setPlainText(text)
+
+    def update_text(self, text):
+        """same as set_text, but only the part of the text that changed is replaced in the Qt document, which avoids
+        rebuilding the whole view (and keeps the undo history of an editable pane)"""
+        if self.large_text is not None or 0 < self.large_threshold < len(text):
+            self.set_text(text)
+            return
+        old_text = self.toPlainText()
+        prefix = live.common_prefix_length(old_text, text)
+        suffix = live.common_suffix_length(old_text, text, min(len(old_text), len(text)) - prefix)
+        if prefix == len(old_text) == len(text):
+            return
+        idx_start = utf16_length(old_text[:prefix])
+        cursor = Qg.QTextCursor(self.document())
+        cursor.setPosition(idx_start)
+        cursor.setPosition(idx_start + utf16_length(old_text[prefix:len(old_text) - suffix]),
+                           Qg.QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText(text[prefix:len(text) - suffix])
+
+    def clear(self):
+        self._leave_large_mode()
+        super().clear()
+
+    def setReadOnly(self, read_only):
+        self.editable = not read_only
+        super().setReadOnly(read_only or self.large_text is not None)
+
+    def insertFromMimeData(self, source):
+        """a large pasted text replaces the selection in the backing buffer instead of being inserted in the view"""
+        text = source.text() if source.hasText() else ""
+        if not (0 < self.large_threshold < len(text)):
+            super().insertFromMimeData(source)
+            return
+        old_text = self.toPlainText()
+        cursor = self.textCursor()
+        # the cursor positions are converted from UTF-16 code units
+        encoded = old_text.encode("utf-16-le")
+        idx_start = len(encoded[:2 * cursor.selectionStart()].decode("utf-16-le"))
+        idx_end = len(encoded[:2 * cursor.selectionEnd()].decode("utf-16-le"))
+        self.set_text(old_text[:idx_start] + text + old_text[idx_end:])
+        self.textChanged.emit()
+
+    def _set_large_text(self, text):
+        self.large_text = text
+        self.num_loaded = 0
+        super().setReadOnly(True)
+        super().setPlainText("")
+        self._load_next_chunk()
+        self._load_visible_chunks()
+        self.large_document.emit(len(text))
+
+    def _leave_large_mode(self):
+        if self.large_text is None:
+            return
+        self.large_text = None
+        self.num_loaded = 0
+        super().setReadOnly(not self.editable)
+
+    def _load_next_chunk(self):
+        """adds the next chunk of the backing buffer to the view, the chunks end with a line break or a '>' when
+        possible"""
+        idx_end = self.num_loaded + CHUNK_SIZE
+        if idx_end < len(self.large_text):
+            idx_break = max(self.large_text.rfind("\n", self.num_loaded, idx_end),
+                            self.large_text.rfind(">", self.num_loaded, idx_end))
+            idx_end = idx_break + 1 if idx_break != -1 else idx_end
+        chunk = self.large_text[self.num_loaded:idx_end]
+        view_text = "\n".join(VIEW_LINE_RE.findall(chunk))
+        if self.num_loaded != 0:
+            view_text = "\n" + view_text
+        self.num_loaded += len(chunk)
+        cursor = Qg.QTextCursor(self.document())
+        cursor.movePosition(Qg.QTextCursor.MoveOperation.End)
+        cursor.insertText(view_text)
+
+    def _load_visible_chunks(self, *args):
+        """loads chunks until the end of the loaded text is more than LOAD_MARGIN_PAGES pages after the view"""
+        if self.large_text is None:
+            return
+        v_bar, h_bar = self.verticalScrollBar(), self.horizontalScrollBar()
+        while self.num_loaded < len(self.large_text):
+            fits = v_bar.maximum() == 0 and h_bar.maximum() == 0
+            near_end = any(bar.maximum() > 0 and bar.maximum() - bar.value() <= LOAD_MARGIN_PAGES * bar.pageStep()
+                           for bar in [v_bar, h_bar])
+            if not (fits or near_end):
+                return
+            previous_range = (v_bar.maximum(), h_bar.maximum())
+            self._load_next_chunk()
+            if (v_bar.maximum(), h_bar.maximum()) == previous_range:
+                # the new chunk did not make the view longer (yet), the next scroll loads more
+                return
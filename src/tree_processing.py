@@ -2,87 +2,324 @@ import bs4
 import re
 
 
+# parsers that can be chosen with the 'parser' setting, html.parser is the only one that does not need an extra package
+PARSER_BACKENDS = ["html.parser", "lxml", "html5lib"]
+DEFAULT_PARSER = "html.parser"
+
+
+def is_parser_available(parser):
+    try:
+        bs4.BeautifulSoup("", parser)
+    except bs4.FeatureNotFound:
+        return False
+    return True
+
+
+def get_available_parsers():
+    return [parser for parser in PARSER_BACKENDS if is_parser_available(parser)]
+
+
+def get_usable_parser(parser):
+    """returns parser if it can be used, the default parser otherwise"""
+    if parser in PARSER_BACKENDS and is_parser_available(parser):
+        return parser
+    return DEFAULT_PARSER
+
+
+def parse(in_html, parser=DEFAULT_PARSER):
+    return bs4.BeautifulSoup(in_html, parser)
+
+
+# pre-processing rules in their application order: (rule name, enabling setting, affected tags setting)
+PRE_PROCESSING_RULES = [
+    ("clear_shopify_tags", "pre_proc_clear_shopify_tags", None),
+    ("unwrap_without_class", "pre_proc_unwrap_without_class", "pre_proc_unwrap_without_class_affected"),
+    ("remove_attributes", "pre_proc_remove_attributes", "pre_proc_remove_attributes_affected"),
+    ("unwrap_no_content", "pre_proc_unwrap_no_content", "pre_proc_unwrap_no_content_affected"),
+    ("group_consecutive", "pre_proc_group_consecutive", "pre_proc_group_consecutive_affected"),
+]
+
+
+def _as_tags_set(tags_names):
+    if isinstance(tags_names, str):
+        return {tags_names}
+    return set(tags_names)
+
+
+def parse_style(style):
+    """returns the declarations of a style attribute value as a {property: value} dict, properties are in lower
+    case"""
+    declarations = {}
+    for declaration in style.split(";"):
+        name, separator, value = declaration.partition(":")
+        if separator:
+            declarations[name.strip().lower()] = value.strip()
+    return declarations
+
+
+def _is_shopify_useless_strong(tag):
+    font_weight = parse_style(tag.get("style", "")).get("font-weight", "")
+    return font_weight.split("!")[0].strip().lower() == "normal"
+
+
+def _can_unwrap_without_class(tag):
+    if "class" not in tag.attrs:
+        if tag.parent:
+            p_name = tag.parent.name
+            if p_name not in ["body", '[document]', "html", "head"]:
+                return True
+    return False
+
+
+def _remove_none_class_attributes(tag):
+    """returns True if some attributes were removed"""
+    if "class" in tag.attrs:
+        if len(tag.attrs) == 1:
+            return False
+        tag.attrs = {"class": tag["class"]}
+    else:
+        if len(tag.attrs) == 0:
+            return False
+        tag.attrs = {}
+    return True
+
+
+# types of the strings taken into account by tag.get_text() for most tags
+TEXT_STRING_TYPES = {bs4.NavigableString, bs4.CData}
+
+
+def _has_no_content(tag, tags_with_text=None):
+    """tags_with_text is the result of _get_tags_with_text for the tree of tag, the text of tag is searched
+    otherwise"""
+    if tags_with_text is None or tag.interesting_string_types != TEXT_STRING_TYPES:
+        return len(tag.get_text(strip=True)) == 0
+    return id(tag) not in tags_with_text
+
+
+def _get_tags_with_text(tree):
+    """returns the ids of the tags that have a non-whitespace text in their descendants, computed in one post-order
+    traversal of the tree (the text of a tag is known once all its children have been visited)"""
+    tags_with_text = set()
+    stack = [(tree, False)]
+    while stack:
+        tag, children_visited = stack.pop()
+        if not children_visited:
+            stack += [(tag, True)]
+            stack += [(child, False) for child in tag.contents if isinstance(child, bs4.Tag)]
+            continue
+        for child in tag.contents:
+            if id(child) in tags_with_text or (type(child) in TEXT_STRING_TYPES and child.strip()):
+                tags_with_text.add(id(tag))
+                break
+    return tags_with_text
+
+
 def unwrap_shopify_useless_strong_tags(tree):
     for match in tree.find_all("strong"):
-        tag_txt = str(match).lower().replace(" ", "")
-        if 'style="font-weight:normal' in tag_txt:
+        if _is_shopify_useless_strong(match):
             match.unwrap()
     return tree
 
 
 def unwrap_tags_without_classes(tree, tag_name="div"):
     for match in tree.find_all(tag_name):
-        if "class" not in match.attrs:
-            if match.parent:
-                p_name = match.parent.name
-                if p_name not in ["body", '[document]', "html", "head"]:
-                    match.unwrap()
+        if _can_unwrap_without_class(match):
+            match.unwrap()
 
     return tree
 
 
 def remove_none_class_attributes(tree, tags_names="p"):
-    search_tags = tags_names
-    if isinstance(search_tags, str):
-        search_tags = {search_tags}
-    for search_tag in search_tags:
-        for match in tree.find_all(search_tag):
-            if "class" in match.attrs:
-                match.attrs = {"class": match["class"]}
-            else:
-                match.attrs = {}
+    for match in tree.find_all(list(_as_tags_set(tags_names))):
+        _remove_none_class_attributes(match)
     return tree
 
 
 def unwrap_tags_with_no_content(tree, tags_names="p"):
-    search_tags = tags_names
-    if isinstance(search_tags, str):
-        search_tags = {search_tags}
-    for search_tag in search_tags:
-        for x in tree.find_all(search_tag):
-            if len(x.get_text(strip=True)) == 0:
-                x.unwrap()
+    # unwrapping a tag does not change the text of the other tags, so it is computed once for the whole tree
+    tags_with_text = _get_tags_with_text(tree)
+    # the children are unwrapped before their parents, as the cost of unwrapping a tag grows with its depth
+    for x in reversed(tree.find_all(list(_as_tags_set(tags_names)))):
+        if _has_no_content(x, tags_with_text):
+            x.unwrap()
     return tree
 
 
-def group_consecutive_tags(tree, tags_names="p"):
-    html_text = clear_spaces(str(tree))
-    search_tags = tags_names
-    if isinstance(search_tags, str):
-        search_tags = {search_tags}
-    dummy_tag = "</br dummy_attribute_remove_me_later_please>"
-    for search_tag in search_tags:
-        updated = True
-        while updated:
-            updated = False
-            for bridge in ["", " "]:
-                # TODO: use beautifulsoup for this issue later
-                search_term = f"</{search_tag}>{bridge}<{search_tag}"
-                idx = html_text.find(search_term)
-                if idx == -1:
-                    continue
-                search_term_ext = html_text[idx + len(search_term): html_text.find(">", idx + len(search_term)) + 1]
-                r_idx = html_text.rfind(f"<{search_tag}", 0, idx)
-                if search_tag == "b" and html_text[r_idx + 2] == "r": # for <br> case
-                    r_idx = html_text.rfind(f"<{search_tag}", 0, r_idx - 1)
-                l_idx = html_text.find(f"</{search_tag}>", idx + 1)
-                if l_idx == -1 or r_idx == -1:
-                    print("WARNING: this should not have happened (find group_consecutive_tags)")
-                l_idx += len(f"</{search_tag}>")
-                # print(html_text[r_idx:l_idx])
-                twin_tags = bs4.BeautifulSoup(html_text[r_idx:l_idx], "html.parser").find_all(search_tag)
-                replace_with = bridge
-                if len(twin_tags) != 2:
-                    replace_with = f"</{search_tag}>{dummy_tag}<{search_tag} {search_term_ext}"
-                elif twin_tags[0].attrs != twin_tags[1].attrs:
-                    replace_with = f"</{search_tag}>{dummy_tag}<{search_tag} {search_term_ext}"
-
-                updated = True
-                html_text = html_text.replace(search_term + search_term_ext, replace_with, 1)
+def compile_pre_processing_rules(settings):
+    """returns the table of the enabled pre-processing rules: {tag name: [rule names in application order]}, and the
+    tags affected by the 'group_consecutive' rule (None if disabled)"""
+    table = {}
+    group_tags = None
+    for rule_name, enabled_key, affected_key in PRE_PROCESSING_RULES:
+        if not settings[enabled_key]:
+            continue
+        tags_names = {"strong"} if affected_key is None else _as_tags_set(settings[affected_key])
+        if rule_name == "group_consecutive":
+            group_tags = tags_names
+            continue
+        for tag_name in tags_names:
+            table.setdefault(tag_name, []).append(rule_name)
+    return table, group_tags
+
+
+def pre_process(tree, settings, before_traversal=None):
+    """Applies all the enabled pre-processing rules (see PRE_PROCESSING_RULES) with the same result as running the
+    matching functions one after the other, but in two traversals of the tree: a pre-order one for the rules that
+    work on each tag (the parents of a tag are final when it is visited, as they would be in the separated passes),
+    followed by the 'group_consecutive' one. Tags without content are only unwrapped after the first traversal,
+    since this rule does not depend on the others, while the other rules depend on the parents of the tags.
+    before_traversal() is called before each traversal, for instance to stop the processing by raising an exception.
+    Returns the tree and the number of hits of each enabled rule."""
+    table, group_tags = compile_pre_processing_rules(settings)
+    hits = {rule_name: 0 for rule_name, enabled_key, _ in PRE_PROCESSING_RULES if settings[enabled_key]}
+
+    no_content_candidates = []
+    if table and before_traversal is not None:
+        before_traversal()
+    stack = [child for child in reversed(tree.contents) if isinstance(child, bs4.Tag)] if table else []
+    while stack:
+        tag = stack.pop()
+        stack += [child for child in reversed(tag.contents) if isinstance(child, bs4.Tag)]
+        for rule_name in table.get(tag.name, []):
+            if rule_name == "clear_shopify_tags" and _is_shopify_useless_strong(tag):
+                tag.unwrap()
+                hits[rule_name] += 1
                 break
+            if rule_name == "unwrap_without_class" and _can_unwrap_without_class(tag):
+                tag.unwrap()
+                hits[rule_name] += 1
+                break
+            if rule_name == "remove_attributes" and _remove_none_class_attributes(tag):
+                hits[rule_name] += 1
+            if rule_name == "unwrap_no_content":
+                no_content_candidates += [tag]
+
+    tags_with_text = _get_tags_with_text(tree) if no_content_candidates else None
+    for tag in reversed(no_content_candidates):
+        if _has_no_content(tag, tags_with_text):
+            tag.unwrap()
+            hits["unwrap_no_content"] += 1
+
+    if group_tags is not None:
+        if before_traversal is not None:
+            before_traversal()
+        hits["group_consecutive"] = _group_consecutive(tree, group_tags)
+    return tree, hits
+
+
+def group_consecutive_tags(tree, tags_names="p"):
+    """Merges consecutive sibling tags that have the same name (from tags_names) and attributes, in one traversal of
+    the tree. Tags separated by a whitespace text are also merged, a single space is kept between their contents."""
+    _group_consecutive(tree, _as_tags_set(tags_names))
+    return tree
+
+
+def _group_consecutive(tree, search_tags):
+    """returns the number of merged tags"""
+    num_merged = 0
+    # parents are processed before their children, so that the children of two merged tags are checked together
+    stack = [tree]
+    while stack:
+        tag = stack.pop()
+        num_merged += _group_consecutive_children(tag, search_tags)
+        stack += [child for child in tag.contents if isinstance(child, bs4.Tag)]
+    return num_merged
+
+
+def _group_consecutive_children(tag, search_tags):
+    num_merged = 0
+    previous = None
+    bridge = None
+    for child in list(tag.contents):
+        if isinstance(child, bs4.Tag):
+            if previous is not None and child.name == previous.name and child.attrs == previous.attrs:
+                if bridge is not None:
+                    bridge.extract()
+                    previous.append(" ")
+                for grandchild in list(child.contents):
+                    previous.append(grandchild)
+                child.extract()
+                num_merged += 1
+            elif child.name in search_tags:
+                previous = child
+            else:
+                previous = None
+            bridge = None
+        elif type(child) is bs4.NavigableString and previous is not None and bridge is None and child.strip() == "":
+            bridge = child
+        else:
+            previous = None
+            bridge = None
+    return num_merged
+
+
+# classes of the <div> wrappers generated by the formatter
+GENERATED_CLASSES = {"ss_container", "ss_column_1", "ss_column_2", "ss_end"}
 
-    html_text = html_text.replace(dummy_tag, "")
-    return bs4.BeautifulSoup(html_text, "html.parser")
+# elements whose text is kept as is (line breaks included) when clearing a document
+PRESERVE_WHITESPACE_TAGS = {"pre", "textarea"}
+
+# previously generated HTML, as written by the formatter or with a different spacing or quoting (case-insensitive),
+# and the <pre> or <textarea> elements in which the line breaks are kept
+GENERATED_HTML_RE = re.compile(
+    r"(?P<preserved><(?P<tag>pre|textarea)\b.*?</(?P=tag)\s*>)"
+    r"|(?P<line_break>\n)"
+    r"|(?P<next></div\s*>\s*<div\s+class\s*=\s*[\"']ss_column_[12][\"']\s*>)"
+    r"|(?P<end><div\s+class\s*=\s*[\"']ss_end[\"']\s*>\s*</div\s*>\s*</div\s*>\s*</div\s*>)"
+    r"|(?P<start><div\s+class\s*=\s*[\"']ss_(?:container|column_[12])[\"']\s*>)",
+    re.IGNORECASE | re.DOTALL)
+
+
+def clear_generated_html(in_html):
+    """Text version of clearing a document: removes the previously generated HTML and the line breaks (except in
+    <pre> and <textarea> elements) in a single scan. Returns the cleared text, the number of removed generated
+    patterns and the number of removed line breaks."""
+    counts = {"patterns": 0, "line_breaks": 0}
+
+    def replace(match):
+        if match.group("preserved") is not None:
+            return match.group("preserved")
+        counts["line_breaks"] += match.group().count("\n")
+        if match.group("line_break") is None:
+            counts["patterns"] += 1
+        return ""
+
+    return GENERATED_HTML_RE.sub(replace, in_html), counts["patterns"], counts["line_breaks"]
+
+
+def _is_generated_wrapper(tag):
+    return tag.name == "div" and any(c in GENERATED_CLASSES for c in tag.get_attribute_list("class"))
+
+
+def unwrap_generated_wrappers(tree):
+    """unwraps the <div> wrappers generated by a previous formatting (whatever their spacing or other attributes),
+    found in one traversal of the tree, and returns their number"""
+    wrappers = tree.find_all(_is_generated_wrapper)
+    # the children are unwrapped before their parents, as the cost of unwrapping a tag grows with its depth
+    for wrapper in reversed(wrappers):
+        wrapper.unwrap()
+    return len(wrappers)
+
+
+def remove_line_breaks(tree):
+    """removes the line breaks of the text nodes (except in <pre> and <textarea> elements) and of the attribute
+    values, in one traversal of the tree, and returns their number"""
+    num_line_breaks = 0
+    stack = [(tree, False)]
+    while stack:
+        tag, preserved = stack.pop()
+        for key, value in tag.attrs.items():
+            if isinstance(value, str) and "\n" in value:
+                num_line_breaks += value.count("\n")
+                tag[key] = value.replace("\n", "")
+        preserved = preserved or tag.name in PRESERVE_WHITESPACE_TAGS
+        for child in list(tag.contents):
+            if isinstance(child, bs4.Tag):
+                stack += [(child, preserved)]
+            elif not preserved and "\n" in child:
+                num_line_breaks += child.count("\n")
+                child.replace_with(type(child)(child.replace("\n", "")))
+    return num_line_breaks
 
 
 def clear_spaces(in_html):
@@ -94,7 +331,37 @@ def clear_spaces(in_html):
     return res
 
 
-def prettify2(in_html, indent_width=4, encoding=None, formatter="minimal"):
-    tree = bs4.BeautifulSoup(in_html, "html.parser")
+def prettify2(in_html, indent_width=4, encoding=None, formatter="minimal", parser=DEFAULT_PARSER):
+    tree = parse(in_html, get_usable_parser(parser))
     r = re.compile(r'^(\s*)', re.MULTILINE)
     return r.sub(r'\1' * indent_width, tree.prettify(encoding, formatter))
+
+
+def normalize_strings(tree):
+    """Put the text nodes of a modified tree in the state that parsing its serialization would give: consecutive
+    strings are merged, empty strings dropped, and whitespace only strings collapsed to a single '\\n' or ' '
+    (outside of <pre> and <textarea>)"""
+    for tag in [tree] + tree.find_all(True):
+        run = []
+        for child in list(tag.contents) + [None]:
+            if run and (child is None or type(child) is not type(run[0])):
+                _merge_strings(run)
+                run = []
+            if child is not None and type(child) in (bs4.NavigableString, bs4.Script, bs4.Stylesheet):
+                run += [child]
+    return tree
+
+
+def _merge_strings(run):
+    text = "".join(run)
+    if text != "" and text.strip(" \n\t\f\r") == "":
+        if not any(p.name in ("pre", "textarea") for p in run[0].parents):
+            text = "\n" if "\n" in text else " "
+    if len(run) == 1 and text == run[0]:
+        return
+    for string in run[1:]:
+        string.extract()
+    if text == "":
+        run[0].extract()
+    else:
+        run[0].replace_with(type(run[0])(text))
@@ -20,6 +20,8 @@ from PySide6.QtWidgets import (QApplication, QFrame, QGridLayout, QHBoxLayout,
     QSizePolicy, QSpacerItem, QStatusBar, QToolButton,
     QVBoxLayout, QWidget)
 
+from text_panes import LargeTextEdit
+
 class Ui_MainWindow(object):
     def setupUi(self, MainWindow):
         if not MainWindow.objectName():
@@ -179,7 +181,7 @@ class Ui_MainWindow(object):
 
         self.verticalLayout_2.addWidget(self.label)
 
-        self.plain_text_html = QPlainTextEdit(self.widget_7)
+        self.plain_text_html = LargeTextEdit(self.widget_7)
         self.plain_text_html.setObjectName(u"plain_text_html")
 
         self.verticalLayout_2.addWidget(self.plain_text_html)
@@ -287,7 +289,7 @@ class Ui_MainWindow(object):
 
         self.verticalLayout_4.addWidget(self.label_2)
 
-        self.plain_text_processed = QPlainTextEdit(self.widget_4)
+        self.plain_text_processed = LargeTextEdit(self.widget_4)
         self.plain_text_processed.setObjectName(u"plain_text_processed")
         self.plain_text_processed.setReadOnly(True)
 
@@ -100,6 +100,36 @@ class Ui_stg_form(object):
 
         self.verticalLayout.addWidget(self.widget_9)
 
+        self.widget_11 = QWidget(self.widget_2)
+        self.widget_11.setObjectName(u"widget_11")
+        self.horizontalLayout_8 = QHBoxLayout(self.widget_11)
+        self.horizontalLayout_8.setObjectName(u"horizontalLayout_8")
+        self.cbox_live_preview = QCheckBox(self.widget_11)
+        self.cbox_live_preview.setObjectName(u"cbox_live_preview")
+
+        self.horizontalLayout_8.addWidget(self.cbox_live_preview)
+
+        self.sbox_live_delay = QSpinBox(self.widget_11)
+        self.sbox_live_delay.setObjectName(u"sbox_live_delay")
+        self.sbox_live_delay.setMinimum(100)
+        self.sbox_live_delay.setMaximum(5000)
+        self.sbox_live_delay.setSingleStep(100)
+        self.sbox_live_delay.setValue(700)
+
+        self.horizontalLayout_8.addWidget(self.sbox_live_delay)
+
+        self.label_9 = QLabel(self.widget_11)
+        self.label_9.setObjectName(u"label_9")
+
+        self.horizontalLayout_8.addWidget(self.label_9)
+
+        self.horizontalSpacer_6 = QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
+
+        self.horizontalLayout_8.addItem(self.horizontalSpacer_6)
+
+
+        self.verticalLayout.addWidget(self.widget_11)
+
 
         self.verticalLayout_2.addWidget(self.widget_2)
 
@@ -256,6 +286,8 @@ class Ui_stg_form(object):
         self.btn_change.setText(QCoreApplication.translate("stg_form", u"Change", None))
         self.label_6.setText(QCoreApplication.translate("stg_form", u"Indent length: ", None))
         self.label_7.setText(QCoreApplication.translate("stg_form", u"spaces", None))
+        self.cbox_live_preview.setText(QCoreApplication.translate("stg_form", u"Live preview, processing after a pause in typing of ", None))
+        self.label_9.setText(QCoreApplication.translate("stg_form", u"ms", None))
         self.label_2.setText(QCoreApplication.translate("stg_form", u"Pre-processing", None))
         self.label_4.setText(QCoreApplication.translate("stg_form", u"Affected tags:", None))
         self.cbox_remove_attributes.setText(QCoreApplication.translate("stg_form", u"Remove HTML attributes (other then class)", None))
@@ -0,0 +1,125 @@
+import unittest
+import archive
+import config
+import core
+import gzip
+import os
+import tempfile
+from datetime import datetime
+
+
+HTML_TEXT = '<h6>###start###</h6><p>a</p><h6>###next###</h6><p>b</p><h6>###end###</h6>'
+
+
+def wrap_lines_by_char(original_html, line_length):
+    # previous implementation, copying the text one character at a time
+    lines = []
+    line_len = 0
+    cur = ""
+    for i in range(0, len(original_html)):
+        cur += original_html[i]
+        line_len += 1
+        if line_len >= line_length and cur[-1] == ">":
+            lines += [cur]
+            cur = ""
+            line_len = 0
+    if cur != ">":
+        lines += [cur]
+    return lines
+
+
+class TestArchiveMethods(unittest.TestCase):
+
+    def test_wrap_lines(self):
+        for html_text in ["", ">", "<p>", HTML_TEXT, HTML_TEXT * 20 + "x", "<a>\n<b>" * 30]:
+            for line_length in [0, 1, 5, 120]:
+                self.assertEqual(wrap_lines_by_char(html_text, line_length), archive.wrap_lines(html_text, line_length))
+
+        entry = archive.format_entry(HTML_TEXT, False, datetime(2020, 1, 2, 3, 4, 5), line_length=10)
+        self.assertIn("\nTime: 2020-01-02 03:04:05\nHTML Formatting FAILED!\n\n\nOriginal html=\n"
+                      "<h6>###start###</h6>\n<p>a</p><h6>\n###next###</h6>\n", entry)
+
+    def test_read_entries(self):
+        texts = [HTML_TEXT, "", "<p>a</p>\n" * 40, "x>" * 200]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            text_path = os.path.join(tmp_dir, "originals.txt.gz")
+            sqlite_path = os.path.join(tmp_dir, "originals.sqlite")
+            with archive.SqliteArchive(sqlite_path) as sqlite_archive:
+                for i, html_text in enumerate(texts):
+                    now = datetime(2020, 1, i + 1)
+                    archive.append_entry(text_path, archive.format_entry(html_text, i != 1, now), compress=True)
+                    sqlite_archive.add(html_text, i != 1, now=now)
+            expected = [(datetime(2020, 1, i + 1), i != 1, html_text) for i, html_text in enumerate(texts)]
+            self.assertEqual(expected, list(archive.read_entries(text_path)))
+            self.assertEqual(expected, list(archive.read_entries(sqlite_path)))
+
+    def test_append_entry(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "originals.txt")
+            for i in range(3):
+                self.assertEqual(file_path + ".gz", archive.append_entry(file_path, f"entry {i}\n", compress=True,
+                                                                         max_bytes=60, backup_count=1))
+            with gzip.open(file_path + ".gz", 'rt') as f:
+                self.assertEqual("entry 2\n", f.read())
+            with gzip.open(file_path + ".gz.1", 'rt') as f:
+                self.assertEqual("entry 0\nentry 1\n", f.read())
+            self.assertEqual(["originals.txt.gz", "originals.txt.gz.1"], sorted(os.listdir(tmp_dir)))
+
+    def test_archive_writer(self):
+        settings = config.get_default_settings()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            settings["save_origins_to_file"] = True
+            settings["save_file_path"] = os.path.join(tmp_dir, "originals.txt")
+            logs = []
+            writer = archive.ArchiveWriter(lambda msg, lvl: logs.append(msg))
+            result = core.format_html(HTML_TEXT, settings, archive_writer=writer)
+            core.format_html("", settings, archive_writer=writer)
+            writer.close()
+
+            self.assertNotIn("Successfully written original HTML to 'save file'", [m.text for m in result.messages])
+            self.assertEqual(["Successfully written original HTML to 'save file'"] * 2, logs)
+            with open(settings["save_file_path"], 'r') as f:
+                text = f.read()
+            self.assertEqual(2, text.count("HTML Formatting succeeded\n"))
+            self.assertIn(HTML_TEXT + "\n", text)
+
+    def test_sqlite_archive(self):
+        settings = config.get_default_settings()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            settings["save_origins_to_file"] = True
+            settings["save_format"] = "sqlite"
+            settings["save_file_path"] = os.path.join(tmp_dir, "originals.txt")
+            for html_text in [HTML_TEXT, HTML_TEXT, "<h6>###end###</h6>"]:
+                core.format_html(html_text, settings)
+            db_path = os.path.join(tmp_dir, "originals.sqlite")
+            self.assertEqual(["originals.sqlite"], os.listdir(tmp_dir))
+
+            with archive.SqliteArchive(db_path) as sqlite_archive:
+                sqlite_archive.add(HTML_TEXT, True, now=datetime(2020, 1, 2, 3, 4, 5))
+                stats = sqlite_archive.stats()
+                self.assertEqual(4, stats["runs"])
+                self.assertEqual(2, stats["bodies"])
+
+                content_hash = archive.get_content_hash(HTML_TEXT)
+                runs = sqlite_archive.find(content_hash=content_hash[:8])
+                self.assertEqual(3, len(runs))
+                self.assertEqual("2020-01-02 03:04:05", runs[-1]["time"])
+                self.assertEqual(archive.get_settings_hash(settings), runs[0]["settings_hash"])
+                self.assertEqual(len(HTML_TEXT), runs[0]["size"])
+                self.assertEqual(HTML_TEXT, sqlite_archive.get_body(content_hash))
+                self.assertIsNone(sqlite_archive.get_body("0" * 64))
+
+                failed = sqlite_archive.find(success=False)
+                self.assertEqual([archive.get_content_hash("<h6>###end###</h6>")], [r["content_hash"] for r in failed])
+                self.assertEqual(1, len(sqlite_archive.find(since="2020-01-01", until="2020-01-02")))
+                self.assertEqual(3, len(sqlite_archive.find(since="2020-01-03")))
+                self.assertEqual(2, len(sqlite_archive.find(limit=2)))
+
+                paths = sqlite_archive.export(runs, os.path.join(tmp_dir, "export"))
+                self.assertEqual(3, len(paths))
+                with open(paths[-1], 'r') as f:
+                    self.assertEqual(HTML_TEXT, f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+import tempfile
+import os
+import batch
+import config
+
+
+class TestBatchMethods(unittest.TestCase):
+
+    def test_run_batch(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_dir = os.path.join(tmp_dir, "in")
+            output_dir = os.path.join(tmp_dir, "out")
+            os.makedirs(os.path.join(input_dir, "sub"))
+            with open(os.path.join(input_dir, "sub", "good.html"), 'w') as f:
+                f.write('<h6>###start###</h6><p>a</p><h6>###next###</h6><p>b</p><h6>###end###</h6>')
+            with open(os.path.join(input_dir, "bad.html"), 'w') as f:
+                f.write('<h6>###start###</h6><p>a</p><h6>###end###</h6><h6>###end###</h6>')
+
+            summary = batch.run_batch(input_dir, output_dir, config.get_default_settings(), 2)
+
+            self.assertEqual(2, summary["num_files"])
+            self.assertEqual(1, summary["num_failed"])
+            results = {r["file"]: r for r in summary["files"]}
+            self.assertTrue(results[os.path.join("sub", "good.html")]["success"])
+            self.assertFalse(results["bad.html"]["success"])
+            self.assertIn("ERROR", [m["level"] for m in results["bad.html"]["messages"]])
+            self.assertTrue(os.path.isfile(os.path.join(output_dir, "sub", "good.html")))
+            self.assertFalse(os.path.isfile(os.path.join(output_dir, "bad.html")))
+            self.assertTrue(os.path.isfile(os.path.join(output_dir, batch.SUMMARY_FILE_NAME)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import tempfile
+import cache
+import config
+import core
+
+
+HTML_TEXT = '<h6>###start###</h6><p>a</p><h6>###next###</h6><p>b</p><h6>###end###</h6>'
+
+
+class TestCacheMethods(unittest.TestCase):
+
+    def test_memory_cache(self):
+        settings = config.get_default_settings()
+        result_cache = cache.ResultCache(max_entries=2)
+        result = core.format_html(HTML_TEXT, settings, cache=result_cache)
+        logs = []
+        cached = core.format_html(HTML_TEXT, settings, lambda msg, lvl: logs.append(msg), cache=result_cache)
+
+        self.assertIs(result, cached)
+        self.assertEqual([m.text for m in result.messages], logs[:-1])
+        self.assertEqual(1, result_cache.stats()["hits"])
+
+        settings["save_file_path"] = "other_path"
+        self.assertEqual(cache.get_cache_key(HTML_TEXT, config.get_default_settings()),
+                         cache.get_cache_key(HTML_TEXT, settings))
+        # a parser that cannot be used gives the key of the parser used instead
+        settings["parser"] = "missing_parser"
+        self.assertEqual(cache.get_cache_key(HTML_TEXT, config.get_default_settings()),
+                         cache.get_cache_key(HTML_TEXT, settings))
+        settings["pre_proc_unwrap_no_content"] = True
+        self.assertNotEqual(cache.get_cache_key(HTML_TEXT, config.get_default_settings()),
+                            cache.get_cache_key(HTML_TEXT, settings))
+
+        for i in range(3):
+            core.format_html(HTML_TEXT + f"<p>{i}</p>", settings, cache=result_cache)
+        self.assertEqual(2, result_cache.stats()["memory_entries"])
+
+    def test_disk_cache(self):
+        settings = config.get_default_settings()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            result = core.format_html(HTML_TEXT, settings, cache=cache.ResultCache(disk_dir=tmp_dir))
+            result_cache = cache.ResultCache(disk_dir=tmp_dir)
+            cached = core.format_html(HTML_TEXT, settings, cache=result_cache)
+
+            self.assertEqual(result.html, cached.html)
+            self.assertEqual(1, result_cache.stats()["disk_hits"])
+            self.assertEqual(1, result_cache.stats()["disk_entries"])
+            self.assertEqual(1, result_cache.clear())
+            self.assertEqual(0, result_cache.stats()["disk_entries"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+import core
+import config
+import bs4
+import logging
+import os
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+
+class TestCoreMethods(unittest.TestCase):
+
+    def test_format_html(self):
+        html_text = '<h6>###start_inv###</h6><p>a</p><h6>###next###</h6><p>b</p><h6>###end###</h6>'
+        result = core.format_html(html_text, config.get_default_settings())
+
+        self.assertTrue(result.success)
+        self.assertEqual(1, result.num_sequences)
+        self.assertEqual(core.GENERATED_HTML["start_inv"] + '<p>a</p>' + core.GENERATED_HTML["next_inv"] +
+                         '<p>b</p>' + core.GENERATED_HTML["end"], result.html)
+        self.assertEqual([logging.INFO, logging.INFO], [m.level for m in result.messages if m.level >= logging.INFO])
+
+        result = core.format_html('<h6>###next###</h6>', config.get_default_settings())
+        self.assertFalse(result.success)
+        self.assertEqual("", result.html)
+        self.assertEqual(logging.ERROR, result.messages[-1].level)
+        self.assertNotEqual("", result.window_message)
+
+    def test_parser_setting(self):
+        html_text = '<h6>###start###</h6><p>a</p><h6>###next###</h6><p>b</p><h6>###end###</h6>'
+        settings = config.get_default_settings()
+        settings["parser"] = "no_such_parser"
+        result = core.format_html(html_text, settings)
+
+        self.assertTrue(result.success)
+        self.assertEqual(logging.WARNING, result.messages[0].level)
+        self.assertEqual(core.format_html(html_text, config.get_default_settings()).html, result.html)
+
+    def test_progress_and_cancel(self):
+        html_text = '<h6>###start###</h6><p>a</p><h6>###next###</h6><p>b</p><h6>###end###</h6>'
+        stages = []
+        result = core.format_html(html_text, config.get_default_settings(),
+                                  progress_callback=lambda name, idx, num: stages.append(name))
+        self.assertTrue(result.success)
+        self.assertEqual(core.STAGES, stages)
+
+        result = core.format_html(html_text, config.get_default_settings(),
+                                  progress_callback=lambda name, idx, num: stages.append(name),
+                                  is_cancelled=lambda: len(stages) > 5)
+        self.assertTrue(result.cancelled)
+        self.assertFalse(result.success)
+        self.assertEqual(6, len(stages))
+
+    def test_parse_once_matches_text_stages(self):
+        settings = config.get_default_settings()
+        for key in ["pre_proc_clear_shopify_tags", "pre_proc_unwrap_without_class", "pre_proc_remove_attributes",
+                    "pre_proc_unwrap_no_content"]:
+            settings[key] = True
+
+        with open(os.path.join(DATA_DIR, "before_processing.html"), 'r') as f:
+            html_text = f.read()
+        # the text version only recognizes the generated HTML as written by the formatter (the pre-processing
+        # could unwrap empty columns)
+        default_settings = config.get_default_settings()
+        formatted_text = core.format_html(html_text, dict(default_settings, clear_elements=False)).html
+        for html_text, settings in [(html_text, settings), (formatted_text, default_settings)]:
+            html_processor = core.HtmlFormatterCore()
+            expected = html_processor._pre_processing(html_text, settings)
+            expected = html_processor._remove_h6_elements(expected)
+            expected = html_processor._check_for_merged_h6_tags(expected)
+
+            doc = bs4.BeautifulSoup(html_text, "html.parser")
+            doc = html_processor._pre_processing_tree(doc, settings)
+            doc = html_processor._remove_h6_elements_tree(doc)
+            html_processor._check_for_merged_h6_tags_tree(doc)
+            self.assertEqual(expected, str(doc))
+
+    def test_replace_spans(self):
+        html_text = '<h6>###start###</h6><p>a</p><h6>###next###</h6><p>b</p><h6>###end###</h6>'
+        spans = []
+        for h6_tag, new_text in zip(core.HtmlFormatterCore._get_h6_html_data(html_text), ["[", "|", "]"]):
+            spans += [(h6_tag.idx_start, h6_tag.idx_end, new_text)]
+        self.assertEqual('[<p>a</p>|<p>b</p>]', core.HtmlFormatterCore._replace_spans(html_text, spans))
+        self.assertEqual('xy', core.HtmlFormatterCore._replace_spans('abc', [(0, 2, 'x'), (1, 3, 'z'), (2, 3, 'y')]))
+
+    def test_depth_offenders(self):
+        html_text = '<body>\n<div><h6>###start###</h6><p>a</p><h6>###next###</h6></div><h6>###end###</h6>' \
+                    '<h6>title</h6></body>'
+        result = core.format_html(html_text, config.get_default_settings())
+
+        self.assertFalse(result.success)
+        self.assertEqual([{"name": "div", "path": ["[document]", "body", "div"], "line": 2, "column": 1,
+                           "num_markers": 2},
+                          {"name": "body", "path": ["[document]", "body"], "line": 1, "column": 1, "num_markers": 1}],
+                         result.depth_offenders)
+        self.assertIn("[document] -> body -> div at line 2, column 1: 2 marker tags", result.window_message)
+        self.assertEqual([], core.HtmlFormatterCore.get_h6_depth_offenders(html_text.replace("</div>", "")))
+
+    def test_get_marker_types(self):
+        doc = bs4.BeautifulSoup('<h6 title="###end###">###Start### <b>###next###</b><!--###end###--></h6>'
+                                '<h6>###st<b>art</b>###</h6>', "html.parser")
+        self.assertEqual([{core.Types.START, core.Types.NEXT, core.Types.END}, set()],
+                         [core.get_marker_types(h6) for h6 in doc("h6")])
+
+    def test_scan_h6_markers(self):
+        html_text = '<H6 class="t">###START###</H6><h6>random title</h6><h6>\n###Next###</h6><h6>###start### ###end###</h6>'
+        markers = core.scan_h6_markers(html_text)
+
+        self.assertEqual([core.Types.START, core.Types.NEXT, core.Types.END], [m.type for m in markers])
+        self.assertEqual('<H6 class="t">###START###</H6>', html_text[markers[0].idx_start:markers[0].idx_end])
+        self.assertEqual(len(html_text), markers[2].idx_end)
+
+        # the attributes are not searched, as in get_marker_types
+        html_text = '<h6 title="###end###">###Start### <b>###next###</b><!--###end###--></h6>' \
+                    '<h6>###st<b>art</b>###</h6><h6 title="###start###">Intro</h6>'
+        doc = bs4.BeautifulSoup(html_text, "html.parser")
+        self.assertEqual([core.Types.END], [m.type for m in core.scan_h6_markers(html_text)])
+        self.assertEqual([max(core.get_marker_types(h6), key=lambda t: t.value) for h6 in doc("h6")
+                          if core.get_marker_types(h6)], [m.type for m in core.scan_h6_markers(html_text)])
+
+    def test_marker_in_attribute(self):
+        html_text = '<div><h6 title="###start###">Intro</h6><h6>###start###</h6><p>a</p><h6>###next###</h6>' \
+                    '<p>b</p><h6>###end###</h6></div>'
+        logs = []
+        result = core.format_html(html_text, config.get_default_settings(), lambda msg, lvl: logs.append(msg))
+        self.assertTrue(result.success)
+        self.assertEqual(1, result.num_sequences)
+        self.assertIn('<h6 title="###start###">Intro</h6>', result.html)
+        self.assertTrue(any("Cleared '3' h6 elements" in msg for msg in logs))
+
+
+if __name__ == '__main__':
+    unittest.main()
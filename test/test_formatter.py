@@ -1,5 +1,7 @@
 import unittest
 import formatter
+import config
+import logging
 
 
 class TestFormatterMethods(unittest.TestCase):
@@ -19,6 +21,19 @@ class TestFormatterMethods(unittest.TestCase):
         self.assertEqual(3, len(report[1]))
         self.assertEqual(4, len(report[2]))
 
+    def test_signals(self):
+        html_processor = formatter.HtmlFormatter(None)
+        logs = []
+        window_messages = []
+        html_processor.log.connect(lambda msg, lvl, time: logs.append(lvl))
+        html_processor.w_msg.connect(lambda msg, title, width: window_messages.append(title))
+
+        out = html_processor.process('<h6>###start###</h6><h6>###end###</h6>', config.get_default_settings())
+        self.assertEqual("", out)
+        self.assertFalse(html_processor.result.success)
+        self.assertIn(logging.ERROR, logs)
+        self.assertEqual(["Error message"], window_messages)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
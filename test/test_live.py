@@ -0,0 +1,84 @@
+import unittest
+import live
+import core
+import config
+import os
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+SECTION = '<h6>###start###</h6><p>first column {}</p>\n<h6>###next###</h6><p>second column</p><h6>###end###</h6>' \
+          '<p>text between sections</p>\n'
+
+
+def build_document(num_sections):
+    return '<!DOCTYPE html>\n<html><body><div class="page">\n' + \
+           "".join(SECTION.format(i) for i in range(num_sections)) + '</div>\n</body></html>\n'
+
+
+def get_points(points):
+    return [(p.position, p.stack) for p in points]
+
+
+class TestLiveMethods(unittest.TestCase):
+
+    def test_same_result_as_format_html(self):
+        settings = config.get_default_settings()
+        settings["pre_proc_unwrap_no_content"] = True
+        live_formatter = live.IncrementalFormatter()
+        html_text = build_document(10)
+        result = live_formatter.format(html_text, settings)
+        self.assertEqual(core.format_html(html_text, settings).html, result.html)
+        self.assertEqual(10, result.num_sequences)
+        self.assertEqual(9, live_formatter.num_regions)
+        self.assertEqual(10, live_formatter.num_formatted_regions)
+
+        # only the edited region is formatted again
+        idx = html_text.find("first column 5") + len("first column 5")
+        html_text = html_text[:idx] + " <b>edited</b>" + html_text[idx:]
+        result = live_formatter.format(html_text, settings)
+        self.assertEqual(core.format_html(html_text, settings).html, result.html)
+        self.assertEqual(1, live_formatter.num_formatted_regions)
+
+        with open(os.path.join(DATA_DIR, "before_processing.html"), 'r') as f:
+            html_text = f.read()
+        self.assertEqual(core.format_html(html_text, settings).html, live_formatter.format(html_text, settings).html)
+
+        # the unwrap_without_class rule depends on the parent of the tags, the document is formatted as a whole
+        settings["pre_proc_unwrap_without_class"] = True
+        html_text = '<div class="c">' + 3 * '<h6>###start###</h6><span>a</span><h6>###next###</h6><span>b</span>' \
+                                            '<h6>###end###</h6>' + '</div>'
+        result = live_formatter.format(html_text, settings)
+        self.assertEqual(core.format_html(html_text, settings).html, result.html)
+        self.assertNotIn("<span>", result.html)
+        self.assertEqual(0, live_formatter.num_regions)
+
+    def test_split_points(self):
+        live_formatter = live.IncrementalFormatter()
+        html_text = build_document(6)
+        live_formatter.get_split_points(html_text)
+        self.assertEqual(6, len(live_formatter.points))
+        self.assertEqual(["html", "body", "div"], [name for name, _ in live_formatter.points[0].stack])
+        for edit in ["<div>", "</div>", "<h6>###end###</h6>", "<script>", "</h6>", "x\n", ""]:
+            for idx in [0, 70, len(html_text) // 2, len(html_text) - 30]:
+                edited = html_text[:idx] + edit + html_text[idx + 3:]
+                self.assertEqual(get_points(live.SplitScanner(edited).scan()),
+                                 get_points(live_formatter.get_split_points(edited)))
+
+    def test_errors(self):
+        settings = config.get_default_settings()
+        live_formatter = live.IncrementalFormatter()
+        html_text = build_document(4)
+        result = live_formatter.format(html_text.replace("###next###", "###start###", 1), settings)
+        self.assertFalse(result.success)
+        self.assertTrue(live_formatter.format(html_text, settings).success)
+
+        # the whole document is formatted with the other parsers
+        settings["parser"] = "html5lib"
+        self.assertFalse(live.IncrementalFormatter.can_split(settings))
+        self.assertEqual(core.format_html(html_text, settings).html, live_formatter.format(html_text, settings).html)
+        self.assertEqual(0, live_formatter.num_regions)
+
+
+if __name__ == '__main__':
+    unittest.main()
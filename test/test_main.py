@@ -0,0 +1,64 @@
+import unittest
+import importlib.util
+import os
+import tempfile
+import time
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+import PySide6.QtWidgets as Qw
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "__main__.py")
+
+HTML_TEXT = '<h6>###start###</h6><p>a</p><h6>###next###</h6><p>b</p><h6>###end###</h6>'
+
+
+def load_main_module():
+    spec = importlib.util.spec_from_file_location("app_main", MAIN_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestMainWindowMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = Qw.QApplication.instance() or Qw.QApplication([])
+        cls.app_main = load_main_module()
+
+    def test_process_html(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            window = self.app_main.MainWindow()
+            save_file_path = os.path.join(tmp_dir, "originals.txt")
+            window.saved_settings.update(use_cache=False, save_origins_to_file=True, save_file_path=save_file_path,
+                                         save_format="text", save_compress=False)
+            window.show()
+            window.ui.plain_text_html.set_text(HTML_TEXT)
+            window.process_html()
+            t_start = time.time()
+            while window.worker is not None and time.time() - t_start < 30:
+                self.app.processEvents()
+                time.sleep(0.01)
+            self.assertIsNone(window.worker)
+            self.assertIn('<div class="ss_container">', window.ui.plain_text_processed.text())
+            window.close()
+            # the queued original HTML is written when the window is closed
+            with open(save_file_path, 'r') as f:
+                self.assertIn(HTML_TEXT, f.read())
+
+    def test_large_document_panes(self):
+        window = self.app_main.MainWindow()
+        window.saved_settings["large_document_threshold"] = 1000
+        window.apply_large_document_threshold()
+        large_text = HTML_TEXT * 100
+        window.ui.plain_text_html.set_text(large_text)
+        window.ui.plain_text_processed.set_text(large_text)
+        # the input pane stays editable, only the processed HTML pane uses the read-only large-document view
+        self.assertFalse(window.ui.plain_text_html.is_large())
+        self.assertFalse(window.ui.plain_text_html.isReadOnly())
+        self.assertTrue(window.ui.plain_text_processed.is_large())
+        self.assertEqual(large_text, window.ui.plain_text_html.text())
+        window.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
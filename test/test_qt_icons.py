@@ -0,0 +1,57 @@
+import unittest
+import os
+import tempfile
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+import PySide6.QtWidgets as Qw
+import qt_icons
+
+
+def get_pixels(icon):
+    image = icon.pixmap(icon.availableSizes()[0]).toImage()
+    return image.size(), bytes(image.convertToFormat(qt_icons.BINARY_IMAGE_FORMAT).constBits())
+
+
+class TestQtIconsMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = Qw.QApplication.instance() or Qw.QApplication([])
+
+    def setUp(self):
+        self.binary_icons_path = qt_icons.BINARY_ICONS_PATH
+        qt_icons._icons.clear()
+        qt_icons._binary_icons = None
+
+    def tearDown(self):
+        qt_icons.BINARY_ICONS_PATH = self.binary_icons_path
+        qt_icons._icons.clear()
+        qt_icons._binary_icons = None
+
+    def test_binary_icons(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            qt_icons.BINARY_ICONS_PATH = os.path.join(tmp_dir, "missing.bin")
+            decoded = {name: get_pixels(qt_icons.get_icon(name)) for name in qt_icons.get_icon_names()}
+            self.assertIs(qt_icons.get_icon("APP_ICON"), qt_icons.get_icon("APP_ICON"))
+
+            qt_icons.BINARY_ICONS_PATH = os.path.join(tmp_dir, "qt_icons.bin")
+            self.assertEqual(qt_icons.get_icon_names(), qt_icons.build_binary_icons(qt_icons.BINARY_ICONS_PATH))
+            qt_icons._icons.clear()
+            qt_icons._binary_icons = None
+            for name, pixels in decoded.items():
+                self.assertEqual(pixels, get_pixels(qt_icons.get_icon(name)))
+            self.assertEqual(len(decoded), len(qt_icons._binary_icons))
+
+            # a truncated file is ignored, also when it ends inside the pixels of the last icon
+            file_size = os.path.getsize(qt_icons.BINARY_ICONS_PATH)
+            for size in [file_size - 5000, file_size - 1, 1000]:
+                with open(qt_icons.BINARY_ICONS_PATH, 'r+b') as fd:
+                    fd.truncate(size)
+                qt_icons._icons.clear()
+                qt_icons._binary_icons = None
+                last_name = qt_icons.get_icon_names()[-1]
+                self.assertEqual(decoded[last_name], get_pixels(qt_icons.get_icon(last_name)))
+                self.assertEqual({}, qt_icons._binary_icons)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmark"))
+import bench_startup  # noqa: E402
+
+
+class TestStartupMethods(unittest.TestCase):
+
+    def test_lazy_imports(self):
+        run, modules = bench_startup.measure_startup("offscreen")
+        self.assertEqual([], run["heavy_modules_loaded"])
+        self.assertIn("ui_mainwindow", [name for name, _, _ in modules])
+        self.assertGreater(run["time_to_first_window_seconds"], run["import_seconds"])
+
+
+if __name__ == '__main__':
+    unittest.main()
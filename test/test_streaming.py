@@ -0,0 +1,128 @@
+import unittest
+import streaming
+import core
+import config
+import bs4
+import io
+import logging
+import os
+import tempfile
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+
+def format_text(html_text, settings, chunk_size=7):
+    out_file = io.StringIO()
+    result = streaming.format_stream(io.StringIO(html_text), out_file, settings, chunk_size=chunk_size)
+    return result, out_file.getvalue()
+
+
+class TestStreamingMethods(unittest.TestCase):
+
+    def test_format_stream(self):
+        html_text = '<h6 class="t">###start_inv###</h6>\n<p>a&amp;b<br></p>\n<h6>###next###</h6><pre> \n</pre>' \
+                    '<h6>###end###</h6><!-- c -->'
+        result, out_html = format_text(html_text, config.get_default_settings())
+
+        self.assertTrue(result.success)
+        self.assertEqual(1, result.num_sequences)
+        self.assertEqual(core.GENERATED_HTML["start_inv"] + '<p>a&amp;b<br></p>' + core.GENERATED_HTML["next_inv"] +
+                         '<pre> \n</pre>' + core.GENERATED_HTML["end"] + '<!-- c -->', out_html)
+
+        settings = config.get_default_settings()
+        settings["clear_elements"] = False
+        result, out_html = format_text(out_html.replace("<br>", "\n<br/>"), settings)
+        self.assertTrue(result.success)
+        self.assertEqual(0, result.num_sequences)
+        self.assertIn('<p>a&amp;b\n<br/></p>', out_html)
+
+    def test_same_result_as_tree_mode(self):
+        settings = config.get_default_settings()
+        with open(os.path.join(DATA_DIR, "before_processing.html"), 'r') as f:
+            html_text = f.read()
+        for clear_elements in [True, False]:
+            settings["clear_elements"] = clear_elements
+            expected = core.format_html(html_text, settings)
+            result, out_html = format_text(html_text, settings, chunk_size=97)
+            self.assertTrue(result.success)
+            self.assertEqual(expected.num_sequences, result.num_sequences)
+            # the tree mode serializes the document, the streaming mode copies the text as is
+            self.assertEqual(str(bs4.BeautifulSoup(expected.html, "html.parser")).replace("\n", ""),
+                             str(bs4.BeautifulSoup(out_html, "html.parser")).replace("\n", ""))
+
+    def test_chunk_sizes(self):
+        settings = config.get_default_settings()
+        html_text = '<div><b>hello  \n   \n </b><h6>###start###</h6> \n&#10;\t <p>a&#32;\n  b</p>&#32; \n' \
+                    '<h6>###next###</h6><i>x</i> \n <h6>###end###</h6></div>'
+        expected = core.format_html(html_text, settings)
+        outputs = {format_text(html_text, settings, chunk_size)[1] for chunk_size in [1, 5, 7, 9, 12, 1 << 20]}
+        self.assertEqual(1, len(outputs))
+        self.assertEqual(str(bs4.BeautifulSoup(expected.html, "html.parser")),
+                         str(bs4.BeautifulSoup(outputs.pop(), "html.parser")))
+
+    def test_unclosed_elements(self):
+        settings = config.get_default_settings()
+        sequence = '<h6>###start###</h6><p>a</p><h6>###next###</h6><p>b</p><h6>###end###</h6>'
+        html_text = '<div>' + '<p><b>x</b>' * 300 + sequence + '</div>' + sequence
+        expected = core.format_html(html_text, settings)
+        result, out_html = format_text(html_text, settings, chunk_size=97)
+        self.assertTrue(result.success)
+        self.assertEqual(2, result.num_sequences)
+        self.assertEqual(str(bs4.BeautifulSoup(expected.html, "html.parser")),
+                         str(bs4.BeautifulSoup(out_html, "html.parser")))
+
+        # each end tag only costs the elements it closes
+        html_text = '<div>' + sequence + '<p><b>x</b>' * 50000 + '</div>'
+        parser = streaming.StreamingFormatter(io.StringIO(), settings, core.HtmlFormatterCore())
+        parser.feed(html_text[:-len('</div>')])
+        self.assertEqual(50002, len(parser.stack))
+        self.assertEqual(50000, parser.open_counts["p"])
+        self.assertEqual(0, parser.open_counts["b"])
+        parser.feed('</div>')
+        parser.finish()
+        self.assertEqual(0, parser.open_counts["p"])
+        self.assertEqual(1, parser.num_sequences)
+
+    def test_errors(self):
+        settings = config.get_default_settings()
+        result, _ = format_text('<h6>###start###</h6><h6>###end###</h6>', settings)
+        self.assertFalse(result.success)
+        self.assertEqual(logging.ERROR, result.messages[-1].level)
+        self.assertIn("line 1, column 21", result.window_message)
+
+        result, _ = format_text('<h6>###start###</h6><div><h6>###next###</h6></div><h6>###end###</h6>', settings)
+        self.assertFalse(result.success)
+        self.assertIn("&lt;div&gt;", result.window_message)
+
+        result, _ = format_text('<h6>###start###</h6><h6>###next###</h6>', settings)
+        self.assertFalse(result.success)
+
+        settings["pre_proc_group_consecutive"] = True
+        result, out_html = format_text('<h6>###start###</h6><h6>###next###</h6><h6>###start### ###end###</h6>'
+                                       '<h6>###next###</h6><h6>###end###</h6>', settings)
+        self.assertTrue(result.success)
+        self.assertEqual(2, result.num_sequences)
+        self.assertEqual(logging.WARNING, result.messages[0].level)
+
+    def test_format_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_path = os.path.join(tmp_dir, "in.html")
+            out_path = os.path.join(tmp_dir, "out.html")
+            with open(in_path, 'w') as f:
+                f.write('<h6>###end###</h6>')
+            result = streaming.format_file(in_path, out_path, config.get_default_settings())
+            self.assertFalse(result.success)
+            self.assertEqual(["in.html"], os.listdir(tmp_dir))
+
+            with open(in_path, 'w') as f:
+                f.write('<h6>###start###</h6><h6>###next###</h6><h6>###end###</h6>')
+            result = streaming.format_file(in_path, out_path, config.get_default_settings())
+            self.assertTrue(result.success)
+            with open(out_path, 'r') as f:
+                self.assertEqual(core.GENERATED_HTML["start"] + core.GENERATED_HTML["next"] +
+                                 core.GENERATED_HTML["end"], f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+import PySide6.QtCore as Qc
+import PySide6.QtGui as Qg
+import PySide6.QtWidgets as Qw
+import text_panes
+
+
+class TestTextPanesMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = Qw.QApplication.instance() or Qw.QApplication([])
+
+    def test_large_document(self):
+        pane = text_panes.LargeTextEdit()
+        pane.large_threshold = 1000
+        sizes = []
+        pane.large_document.connect(sizes.append)
+        large_text = "<p>a é 😀</p>" * 20000
+        pane.set_text(large_text)
+        self.assertTrue(pane.is_large())
+        self.assertTrue(pane.isReadOnly())
+        self.assertIs(large_text, pane.text())
+        self.assertEqual([len(large_text)], sizes)
+        self.assertLess(pane.num_loaded, len(large_text))
+        self.assertTrue(large_text.startswith(pane.toPlainText().split("\n")[0]))
+
+        pane.set_text("<p>small</p>")
+        self.assertFalse(pane.is_large())
+        self.assertFalse(pane.isReadOnly())
+        self.assertEqual("<p>small</p>", pane.text())
+
+        mime_data = Qc.QMimeData()
+        mime_data.setText(large_text)
+        pane.moveCursor(Qg.QTextCursor.MoveOperation.End)
+        pane.insertFromMimeData(mime_data)
+        self.assertEqual("<p>small</p>" + large_text, pane.text())
+        pane.clear()
+        self.assertFalse(pane.is_large())
+        self.assertEqual("", pane.text())
+
+    def test_update_text(self):
+        pane = text_panes.LargeTextEdit()
+        pane.set_text("<p>😀 first</p>\n<p>second</p>")
+        pane.update_text("<p>😀 first</p>\n<p>2nd</p><p>third</p>")
+        self.assertEqual("<p>😀 first</p>\n<p>2nd</p><p>third</p>", pane.text())
+        pane.update_text("<p>😀</p>")
+        self.assertEqual("<p>😀</p>", pane.text())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,12 @@
 import unittest
 import tree_processing
+import config
+import core
 import bs4
+import os
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
 
 
 class TestStringMethods(unittest.TestCase):
@@ -33,6 +39,89 @@ class TestStringMethods(unittest.TestCase):
         html_res = str(doc)
         self.assertEqual('<span><b>good <br/> introduction</b></span>', html_res)
 
+    def test_group_consecutive_tags5(self):
+        html_text = '<p><a href="https://a.b/c.html">x</a>\n  <em><i>y</i></em>\n<em><i>z</i></em><br/><em>t</em></p>'
+        doc = bs4.BeautifulSoup(html_text, "html.parser")
+        same_doc = tree_processing.group_consecutive_tags(doc, ["em", "i"])
+        html_res = str(same_doc)
+        self.assertIs(doc, same_doc)
+        self.assertEqual('<p><a href="https://a.b/c.html">x</a>\n<em><i>y z</i></em><br/><em>t</em></p>', html_res)
+
+    def test_unwrap_tags_with_no_content_nested(self):
+        html_text = '<div>' + '<span><strong><em>' * 300 + '</em></strong></span>' * 300 + \
+                    '<span> <b>\n</b><em>x</em> <!-- c --></span></div><p><span><![CDATA[y]]></span></p>'
+        tags_names = ["span", "strong", "em"]
+        doc = tree_processing.unwrap_tags_with_no_content(bs4.BeautifulSoup(html_text, "html.parser"), tags_names)
+
+        expected = bs4.BeautifulSoup(html_text, "html.parser")
+        for tag in expected.find_all(tags_names):
+            if len(tag.get_text(strip=True)) == 0:
+                tag.unwrap()
+        self.assertEqual(str(expected), str(doc))
+        self.assertEqual('<div><span> <b>\n</b><em>x</em> <!-- c --></span></div><p><span><![CDATA[y]]></span></p>',
+                         str(doc))
+
+    def test_unwrap_shopify_useless_strong_tags(self):
+        self.assertEqual({"font-weight": "Normal", "color": "red"},
+                         tree_processing.parse_style(" Font-Weight : Normal;color:red; ;"))
+        html_text = '<strong style="font-weight: normal;">a</strong><strong style="color: red; font-weight:normal">' \
+                    'b</strong><strong style="font-weight: bold"><em style="font-weight:normal">c</em></strong>'
+        doc = tree_processing.unwrap_shopify_useless_strong_tags(bs4.BeautifulSoup(html_text, "html.parser"))
+        self.assertEqual('ab<strong style="font-weight: bold"><em style="font-weight:normal">c</em></strong>', str(doc))
+
+    def test_pre_process(self):
+        settings = config.get_default_settings()
+        for _, enabled_key, _ in tree_processing.PRE_PROCESSING_RULES:
+            settings[enabled_key] = True
+        html_texts = ['<p><strong style="font-weight: normal;"><div><em></em><b id="a">x</b></div></strong>'
+                      '<span>y</span></p><p><i>a</i> <i>b</i></p>']
+        for file_name in ["before_processing.html", "opposite_sides_2_columns.html"]:
+            with open(os.path.join(DATA_DIR, file_name), 'r') as f:
+                html_texts += [f.read()]
+
+        for html_text in html_texts:
+            doc = bs4.BeautifulSoup(html_text, "html.parser")
+            tree_processing.unwrap_shopify_useless_strong_tags(doc)
+            tree_processing.unwrap_tags_without_classes(doc, settings["pre_proc_unwrap_without_class_affected"])
+            tree_processing.remove_none_class_attributes(doc, settings["pre_proc_remove_attributes_affected"])
+            tree_processing.unwrap_tags_with_no_content(doc, settings["pre_proc_unwrap_no_content_affected"])
+            tree_processing.group_consecutive_tags(doc, settings["pre_proc_group_consecutive_affected"])
+
+            fused_doc, hits = tree_processing.pre_process(bs4.BeautifulSoup(html_text, "html.parser"), settings)
+            self.assertEqual(str(doc), str(fused_doc))
+            self.assertEqual(len(tree_processing.PRE_PROCESSING_RULES), len(hits))
+
+        self.assertEqual({"clear_shopify_tags": 1, "unwrap_without_class": 2, "remove_attributes": 1,
+                          "unwrap_no_content": 1, "group_consecutive": 1},
+                         tree_processing.pre_process(bs4.BeautifulSoup(html_texts[0], "html.parser"), settings)[1])
+
+    def test_clear_generated_html(self):
+        html_text = '<div class="ss_container">\n<div  class=\'ss_column_1\' id="c">a\n</div> <div class="ss_column_2">' \
+                    '<pre>b\n</pre>\n<p title="x\ny">c</p></div></div><!-- <div class="ss_end"></div> -->'
+        doc = bs4.BeautifulSoup(html_text, "html.parser")
+        self.assertEqual(3, tree_processing.unwrap_generated_wrappers(doc))
+        self.assertEqual(4, tree_processing.remove_line_breaks(doc))
+        self.assertEqual('a <pre>b\n</pre><p title="xy">c</p><!-- <div class="ss_end"></div> -->', str(doc))
+
+        html_text = core.format_html('<h6>###start###</h6>a<h6>###next###</h6>\n<pre>b\n</pre><h6>###end###</h6>',
+                                     dict(config.get_default_settings(), clear_elements=False)).html
+        self.assertEqual(('a<pre>b\n</pre>', 4, 1), tree_processing.clear_generated_html(html_text))
+
+    def test_parsers(self):
+        self.assertIn(tree_processing.DEFAULT_PARSER, tree_processing.get_available_parsers())
+        self.assertEqual(tree_processing.DEFAULT_PARSER, tree_processing.get_usable_parser("no_such_parser"))
+        for parser in tree_processing.get_available_parsers():
+            self.assertEqual(parser, tree_processing.get_usable_parser(parser))
+            self.assertEqual(["a", "b"], [p.text for p in tree_processing.parse("<p>a</p><p>b</p>", parser)("p")])
+
+    def test_normalize_strings(self):
+        html_text = '<div><p>a</p>\n<span> </span>\n<pre> <b></b> </pre></div>'
+        doc = bs4.BeautifulSoup(html_text, "html.parser")
+        doc = tree_processing.unwrap_tags_with_no_content(doc, ["span", "b"])
+        doc = tree_processing.normalize_strings(doc)
+        self.assertEqual(str(bs4.BeautifulSoup(str(doc), "html.parser")), str(doc))
+        self.assertEqual('<div><p>a</p>\n<pre>  </pre></div>', str(doc))
+
 
 if __name__ == '__main__':
     unittest.main()